@@ -1,17 +1,24 @@
+import time
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 
 from services.llm_openai import generate_reply, safe_rewrite
 from services.detector import assess
-from utils.helpers import render_highlighted
+from utils.helpers import render_highlighted_cached
 from services.sbert_lr import predict_proba
-from utils.config import load_threshold
+from utils.config import load_threshold, mode_threshold
+from services.storage import SessionHistory, SessionReport, sweep_spill_dir
+from services.conversation import ConversationRisk
+from services import events, monitoring
+from services.pipeline import init_inference_threads, submit_audit, submit_prewarm
+from services.arrow_io import MIME_TYPES, OUTPUT_EXTENSIONS
 
 st.set_page_config(page_title="Ethical Chat Guard", layout="wide")
 
 CHAT_HEIGHT = 560
 PANEL_HEIGHT = 550
+HISTORY_PAGE_SIZE = 20
+REPORT_FORMATS = {"CSV": "csv", "Parquet": "parquet", "Arrow IPC": "arrow"}
 
 st.markdown(
     """
@@ -162,73 +169,6 @@ button {
 )
 
 # ---------------- helpers ----------------
-def build_session_report(messages, audits):
-    rows = []
-    cat_totals = {}
-
-    for i, m in enumerate(messages):
-        if m.get("role") != "assistant":
-            continue
-
-        audit_idx = m.get("audit_idx")
-        if audit_idx is None or audit_idx >= len(audits):
-            continue
-
-        a = audits[audit_idx]
-
-        user_prompt = ""
-        for j in range(i - 1, -1, -1):
-            if messages[j].get("role") == "user":
-                user_prompt = messages[j].get("content", "")
-                break
-
-        for k, v in (a.categories or {}).items():
-            cat_totals[k] = cat_totals.get(k, 0) + int(v)
-
-        rows.append(
-            {
-                "turn_id": int(audit_idx),
-                "user_prompt": user_prompt,
-                "assistant_reply": m.get("content", ""),
-                "risk_score": int(a.score),
-                "rule_score": float(a.rule_score),
-                "context_score": float(a.context_score),
-                "model_proba": None if a.model_proba is None else float(a.model_proba),
-                "model_score": None if a.model_score is None else float(a.model_score),
-                "explanation": str(a.explanation),
-            }
-        )
-
-    df = pd.DataFrame(rows)
-
-    if df.empty:
-        summary = {
-            "avg_risk": None,
-            "max_risk": None,
-            "riskiest_turn_id": None,
-            "top_categories": [],
-            "category_totals": cat_totals,
-        }
-        return summary, df
-
-    avg_risk = float(df["risk_score"].mean())
-    max_row = df.loc[df["risk_score"].idxmax()]
-    max_risk = int(max_row["risk_score"])
-    riskiest_turn_id = int(max_row["turn_id"])
-
-    top_categories = sorted(cat_totals.items(), key=lambda x: x[1], reverse=True)
-    top_categories = [k for k, v in top_categories if v > 0][:3]
-
-    summary = {
-        "avg_risk": avg_risk,
-        "max_risk": max_risk,
-        "riskiest_turn_id": riskiest_turn_id,
-        "top_categories": top_categories,
-        "category_totals": cat_totals,
-    }
-    return summary, df
-
-
 def _latest_assistant_and_context(messages: list[dict]):
     """
     Returns:
@@ -254,12 +194,61 @@ def _latest_assistant_and_context(messages: list[dict]):
     return last_assistant_idx, last_assistant_text, last_user_text
 
 
+def _resolve_pending_audit(wait: bool) -> bool:
+    """
+    Attach the background audit of the latest reply once it finishes.
+    Returns True when an audit was attached.
+    """
+    fut = st.session_state.pending_audit
+    if fut is None or (not wait and not fut.done()):
+        return False
+    st.session_state.pending_audit = None
+    try:
+        a = fut.result()
+    except Exception as e:
+        st.error(f"Audit failed: {e}")
+        return False
+    audit = st.session_state.history.attach_audit(a)
+    if audit is None:
+        return False
+    st.session_state.report.add(audit.turn_id, audit)
+    st.session_state.convo_risk.update(audit.turn_id, audit)
+    return True
+
+
+@st.cache_resource
+def _process_startup() -> bool:
+    # once per server process: size torch for the audit pool and drop spill
+    # files left behind by ended sessions
+    init_inference_threads()
+    sweep_spill_dir()
+    return True
+
+
+_process_startup()
+
 # ---------------- state ----------------
-if "messages" not in st.session_state:
-    st.session_state.messages = [{"role": "system", "content": "You are a helpful assistant."}]
+if "history" not in st.session_state:
+    st.session_state.history = SessionHistory()
+
+# how many pages of spilled (on-disk) history are shown above the live window
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 0
 
-if "audits" not in st.session_state:
-    st.session_state.audits = []
+if "report" not in st.session_state:
+    st.session_state.report = SessionReport()
+
+# rolling conversation-level risk, updated once per audited turn
+if "convo_risk" not in st.session_state:
+    st.session_state.convo_risk = ConversationRisk()
+
+# cached session export: ((turn count, format) it was built for, bytes)
+if "report_csv" not in st.session_state:
+    st.session_state.report_csv = None
+
+# future for the audit of the latest reply, filled in after the reply is shown
+if "pending_audit" not in st.session_state:
+    st.session_state.pending_audit = None
 
 if "mode" not in st.session_state:
     st.session_state.mode = "Balanced"
@@ -298,8 +287,12 @@ with h_mode:
 with h_reset:
     st.markdown('<div class="header-controls">', unsafe_allow_html=True)
     if st.button("Reset chat", use_container_width=True):
-        st.session_state.messages = [{"role": "system", "content": "You are a helpful assistant."}]
-        st.session_state.audits = []
+        st.session_state.history.clear()
+        st.session_state.pending_audit = None
+        st.session_state.history_pages = 0
+        st.session_state.report = SessionReport()
+        st.session_state.convo_risk = ConversationRisk()
+        st.session_state.report_csv = None
         st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -311,10 +304,14 @@ with right:
     panel = st.container(height=PANEL_HEIGHT, border=True)
 
     with panel:
-        if not st.session_state.audits:
+        _resolve_pending_audit(wait=False)
+
+        if st.session_state.pending_audit is not None:
+            st.write("Auditing the latest reply...")
+        elif st.session_state.history.last_audit is None:
             st.write("Send a message to see risk analysis.")
         else:
-            last = st.session_state.audits[-1]
+            last = st.session_state.history.last_audit
             score = int(last.score)
 
             if score <= 25:
@@ -339,10 +336,20 @@ with right:
             st.markdown('<div class="section-title">Why this label</div>', unsafe_allow_html=True)
             st.write(last.explanation)
 
+            convo = st.session_state.convo_risk
+            if len(convo) > 1:
+                st.markdown('<div class="section-title">Conversation trend</div>', unsafe_allow_html=True)
+                c1, c2 = st.columns(2, gap="small")
+                c1.metric("Rolling risk", f"{convo.rolling_score:.0f}/100")
+                c2.metric("Trend", f"{convo.trend:+.1f}/turn")
+                for alert in convo.alerts[-3:][::-1]:
+                    if alert["kind"] in convo.active:
+                        st.warning(alert["message"])
+
         # ---------------- NEW FEATURE: SAFE REWRITE ----------------
         st.markdown('<div class="section-title">Safe rewrite suggestion</div>', unsafe_allow_html=True)
 
-        last_a_idx, last_a_text, last_user_text = _latest_assistant_and_context(st.session_state.messages)
+        last_a_idx, last_a_text, last_user_text = _latest_assistant_and_context(st.session_state.history.messages())
 
         if last_a_text is None or not last_a_text.strip():
             st.write("No assistant reply yet to rewrite.")
@@ -379,30 +386,27 @@ with right:
                 if add_btn:
                     # Audit the rewrite too (so it updates the panel & is included in session CSV)
                     rewrite_text = st.session_state.safe_rewrite_text
-                    th = load_threshold()
+                    model_threshold = mode_threshold(load_threshold(), st.session_state.mode)
+                    t0 = time.perf_counter()
                     p = predict_proba(rewrite_text)
 
-                    if st.session_state.mode == "Conservative":
-                        model_threshold = min(0.95, th + 0.10)
-                    elif st.session_state.mode == "Aggressive":
-                        model_threshold = max(0.01, th - 0.10)
-                    else:
-                        model_threshold = th
-
                     # Use last_user_text as the "user message" context for assessment
-                    a2 = assess(last_user_text, rewrite_text, model_proba=p, model_threshold=model_threshold)
-
-                    audit_idx = len(st.session_state.audits)
-                    st.session_state.audits.append(a2)
-
-                    st.session_state.messages.append(
-                        {
-                            "role": "assistant",
-                            "content": rewrite_text,
-                            "audit_idx": audit_idx,
-                        }
+                    a2 = assess(
+                        last_user_text, rewrite_text, model_proba=p, model_threshold=model_threshold,
+                        mode=st.session_state.mode,
+                    )
+                    monitoring.record(a2)
+                    events.emit_audit(
+                        a2, last_user_text, rewrite_text, "rewrite",
+                        {"total": 1000.0 * (time.perf_counter() - t0)}, st.session_state.history.session_id,
+                        requested_mode=st.session_state.mode,
                     )
 
+                    _resolve_pending_audit(wait=True)
+                    audit = st.session_state.history.append("assistant", rewrite_text, a2)
+                    st.session_state.report.add(audit.turn_id, audit)
+                    st.session_state.convo_risk.update(audit.turn_id, audit)
+
                     st.session_state.safe_rewrite_text = None
                     st.session_state.safe_rewrite_source_turn = None
                     st.rerun()
@@ -410,38 +414,55 @@ with right:
         # ---------------- SESSION SUMMARY REPORT (your existing feature) ----------------
         st.markdown('<div class="section-title">Session summary report</div>', unsafe_allow_html=True)
 
-        summary, report_df = build_session_report(st.session_state.messages, st.session_state.audits)
+        report = st.session_state.report
 
-        if report_df.empty:
+        if len(report) == 0:
             st.write("No session data yet. Send at least one message.")
         else:
-            csv_bytes = report_df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "Download Session Report (CSV)",
-                data=csv_bytes,
-                file_name=f"session_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True,
+            fmt_name = st.selectbox(
+                "Report format", list(REPORT_FORMATS), key="report_fmt", label_visibility="collapsed",
             )
+            fmt = REPORT_FORMATS[fmt_name]
+
+            # report is only serialised on request, not on every rerun
+            cached = st.session_state.report_csv
+            if cached is None or cached[0] != (len(report), fmt):
+                if st.button(f"Prepare Session Report ({fmt_name})", use_container_width=True):
+                    st.session_state.report_csv = ((len(report), fmt), report.to_bytes(st.session_state.history, fmt))
+                    st.rerun()
+            else:
+                st.download_button(
+                    f"Download Session Report ({fmt_name})",
+                    data=cached[1],
+                    file_name=f"session_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}{OUTPUT_EXTENSIONS[fmt]}",
+                    mime=MIME_TYPES[fmt],
+                    use_container_width=True,
+                )
 
 with left:
     st.markdown('<div class="chatbox-title">Conversation</div>', unsafe_allow_html=True)
     chat_box = st.container(height=CHAT_HEIGHT, border=True)
 
     with chat_box:
-        for m in st.session_state.messages:
+        history = st.session_state.history
+
+        shown_from = max(0, history.spilled - st.session_state.history_pages * HISTORY_PAGE_SIZE)
+        if shown_from > 0:
+            if st.button("Load earlier messages", use_container_width=True):
+                st.session_state.history_pages += 1
+                st.rerun()
+
+        visible = history.load_spilled(shown_from, history.spilled) + list(history.recent)
+
+        for m in visible:
             if m["role"] not in ("user", "assistant"):
                 continue
 
             with st.chat_message(m["role"]):
-                if m["role"] == "assistant":
-                    idx = m.get("audit_idx", None)
-                    if idx is not None and 0 <= idx < len(st.session_state.audits):
-                        a = st.session_state.audits[idx]
-                        html_text = render_highlighted(m["content"], a.spans)
-                        st.markdown(html_text, unsafe_allow_html=True)
-                    else:
-                        st.markdown(m["content"])
+                a = m.get("audit")
+                if m["role"] == "assistant" and a is not None:
+                    html_text = render_highlighted_cached(m["content"], a.spans)
+                    st.markdown(html_text, unsafe_allow_html=True)
                 else:
                     st.markdown(m["content"])
 
@@ -449,23 +470,20 @@ with left:
 user_msg = st.chat_input("Type your message")
 
 if user_msg:
-    st.session_state.messages.append({"role": "user", "content": user_msg})
+    _resolve_pending_audit(wait=True)
+    st.session_state.history.append("user", user_msg)
 
-    reply = generate_reply(st.session_state.messages)
+    # load the embedder while the LLM is generating (a no-op once loaded)
+    warm = submit_prewarm()
+    reply = generate_reply(st.session_state.history.context_messages())
 
-    th = load_threshold()
-    p = predict_proba(reply)
-
-    if st.session_state.mode == "Conservative":
-        model_threshold = min(0.95, th + 0.10)
-    elif st.session_state.mode == "Aggressive":
-        model_threshold = max(0.01, th - 0.10)
-    else:
-        model_threshold = th
-
-    a = assess(user_msg, reply, model_proba=p, model_threshold=model_threshold)
+    st.session_state.pending_audit = submit_audit(
+        user_msg, reply, st.session_state.mode, warm=warm, session=st.session_state.history.session_id,
+    )
+    st.session_state.history.append("assistant", reply)
+    st.rerun()
 
-    audit_idx = len(st.session_state.audits)
-    st.session_state.audits.append(a)
-    st.session_state.messages.append({"role": "assistant", "content": reply, "audit_idx": audit_idx})
-    st.rerun()
\ No newline at end of file
+# reply is already on screen; block for its audit and redraw the risk panel
+if st.session_state.pending_audit is not None:
+    _resolve_pending_audit(wait=True)
+    st.rerun()
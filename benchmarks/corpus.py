@@ -0,0 +1,58 @@
+import random
+
+from services.detector import CATEGORY_MARKERS
+
+SEED = 42
+
+# Text lengths (characters) and marker densities (planted phrases per 1,000 characters).
+LENGTHS = [50, 500, 5_000, 50_000]
+DENSITIES = [0.0, 1.0, 5.0]
+
+_FILLER = [
+    "You could review the options", "it may help to compare", "some people prefer",
+    "depending on your situation", "a reasonable next step is", "consider the costs",
+    "there are several approaches", "you might look at", "it is worth noting",
+    "when you have time", "the schedule allows", "one possibility is",
+    "take a look at the details", "the report suggests", "feedback from others",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.sample(_FILLER, 2)
+    return f"{words[0]} and {words[1]}."
+
+
+def make_text(length: int, density: float, rng: random.Random) -> str:
+    """Neutral filler of roughly `length` chars with `density` markers per 1k chars planted at random positions."""
+    parts: list[str] = []
+    size = 0
+    while size < length:
+        s = _sentence(rng).capitalize()
+        parts.append(s)
+        size += len(s) + 1
+
+    n_markers = int(round(density * length / 1000.0))
+    if density > 0:
+        n_markers = max(1, n_markers)
+    phrases = [p for ps in CATEGORY_MARKERS.values() for p in ps]
+    for _ in range(n_markers):
+        i = rng.randrange(len(parts) + 1)
+        parts.insert(i, rng.choice(phrases).capitalize() + ".")
+
+    return " ".join(parts)
+
+
+def make_corpus(n: int, length: int, density: float, seed: int = SEED) -> list[str]:
+    rng = random.Random(f"{seed}:{length}:{density}")
+    return [make_text(length, density, rng) for _ in range(n)]
+
+
+def make_labelled(n: int, length: int = 300, seed: int = SEED) -> tuple[list[str], list[int]]:
+    """Half coercive (density 8/1k), half neutral; deterministic order."""
+    rng = random.Random(f"{seed}:labelled:{length}")
+    texts, labels = [], []
+    for i in range(n):
+        y = i % 2
+        texts.append(make_text(length, 8.0 if y else 0.0, rng))
+        labels.append(y)
+    return texts, labels
@@ -0,0 +1,211 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from openai import OpenAI
+
+from benchmarks import stub_llm
+from benchmarks.corpus import SEED
+from benchmarks.run_benchmarks import _peak_rss_mb, _percentile
+from services import events, monitoring
+from services.conversation import ConversationRisk
+from services.llm_openai import generate_reply
+from services.pipeline import init_inference_threads, submit_audit, submit_prewarm
+from services.sbert_lr import warm_up
+from services.storage import SessionHistory, SessionReport
+from utils.helpers import render_highlighted_cached
+
+SESSION_LEVELS = [1, 2, 4, 8, 16, 32]
+TURNS = 5
+# Turn latency (send -> highlighted reply and risk panel) that counts as sustained.
+SLO_P95_MS = 3000.0
+PROMPTS = [
+    "Can you help me plan my week?",
+    "What should I consider before changing jobs?",
+    "Give me feedback on my savings plan.",
+    "How do I prepare for an interview?",
+    "Be strict with me, I keep procrastinating.",
+    "Should I sign up for this course now or later?",
+    "Push me to finish my thesis.",
+    "What are the risks of this investment?",
+]
+
+
+def _rss_mb() -> float:
+    """Current resident set; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+class Session:
+    """One simulated chat user, following EthicsBot's per-turn path."""
+
+    def __init__(self, client: OpenAI, mode: str, spill_dir: str, seed: str):
+        self.client = client
+        self.mode = mode
+        self.history = SessionHistory(spill_dir=spill_dir)
+        self.report = SessionReport()
+        self.convo_risk = ConversationRisk()
+        self.rng = random.Random(seed)
+
+    def turn(self) -> dict[str, float]:
+        prompt = self.rng.choice(PROMPTS)
+        t0 = time.perf_counter()
+        self.history.append("user", prompt)
+        warm = submit_prewarm()
+        reply = generate_reply(self.history.context_messages(), model="stub", client=self.client)
+        t1 = time.perf_counter()
+        fut = submit_audit(prompt, reply, self.mode, warm=warm, session=self.history.session_id)
+        self.history.append("assistant", reply)
+        a = fut.result()
+        audit = self.history.attach_audit(a)
+        if audit is not None:
+            self.report.add(audit.turn_id, audit)
+            self.convo_risk.update(audit.turn_id, audit)
+        t2 = time.perf_counter()
+        render_highlighted_cached(reply, a.spans)
+        t3 = time.perf_counter()
+        return {
+            "generate": 1000.0 * (t1 - t0),
+            "audit": 1000.0 * (t2 - t1),
+            "render": 1000.0 * (t3 - t2),
+            "total": 1000.0 * (t3 - t0),
+        }
+
+
+def _summary(vals: list[float]) -> dict:
+    vals = sorted(vals)
+    return {
+        "p50": _percentile(vals, 0.50),
+        "p95": _percentile(vals, 0.95),
+        "p99": _percentile(vals, 0.99),
+        "max": vals[-1] if vals else 0.0,
+    }
+
+
+def run_level(client: OpenAI, n_sessions: int, turns: int, mode: str, think_ms: float, spill_dir: str) -> dict:
+    """
+    n_sessions users send `turns` messages each, all at once. Sessions are
+    kept alive until the end so their state counts towards memory.
+    """
+    gc.collect()
+    rss0 = _rss_mb()
+    sessions = [Session(client, mode, spill_dir, f"{SEED}:{n_sessions}:{i}") for i in range(n_sessions)]
+    timings: list[dict[str, float]] = []
+    errors = []
+    lock = threading.Lock()
+
+    def _user(s: Session) -> None:
+        for _ in range(turns):
+            try:
+                t = s.turn()
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                timings.append(t)
+            if think_ms > 0:
+                time.sleep(s.rng.uniform(0.0, think_ms) / 1000.0)
+
+    threads = [threading.Thread(target=_user, args=(s,), name=f"ecg-load-{i}") for i, s in enumerate(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    gc.collect()
+    rss1 = _rss_mb()
+
+    return {
+        "sessions": n_sessions,
+        "turns": len(timings),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": wall,
+        "turns_per_s": len(timings) / wall if wall > 0 else None,
+        "latency_ms": {k: _summary([t[k] for t in timings]) for k in ("total", "generate", "audit", "render")},
+        "rss_mb": rss1,
+        "rss_per_session_mb": max(0.0, rss1 - rss0) / n_sessions,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent chat sessions through generate -> embed -> assess -> render.")
+    ap.add_argument("--sessions", type=int, nargs="+", default=SESSION_LEVELS, help="concurrency levels to run")
+    ap.add_argument("--turns", type=int, default=TURNS, help="messages per session")
+    ap.add_argument("--think_ms", type=float, default=0.0, help="pause between a session's turns, uniform 0..think_ms")
+    ap.add_argument("--mode", default="Balanced", choices=["Conservative", "Balanced", "Aggressive"])
+    ap.add_argument("--slo_ms", type=float, default=SLO_P95_MS, help="p95 turn latency a level must meet")
+    ap.add_argument("--llm_url", default=None, help="use a running stub (e.g. http://127.0.0.1:8799/v1)")
+    ap.add_argument("--latency", default=stub_llm.DEFAULT_LATENCY, help="in-process stub latency spec")
+    ap.add_argument("--corpus_csv", default=None, help="in-process stub replies from this CSV")
+    ap.add_argument("--coercive_share", type=float, default=stub_llm.COERCIVE_SHARE)
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("--out", default="load_results.json")
+    args = ap.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="ecg-load-")
+    # keep load-test audits out of the real event log and score monitor
+    events.WRITER = events.EventWriter(events_dir=os.path.join(work_dir, "events"))
+    monitoring.MONITOR = monitoring.ScoreMonitor(monitor_dir=os.path.join(work_dir, "monitoring"))
+
+    stub = None
+    base_url = args.llm_url
+    if base_url is None:
+        corpus = stub_llm.reply_corpus(args.corpus_csv, coercive_share=args.coercive_share, seed=args.seed)
+        stub = stub_llm.serve("127.0.0.1", 0, corpus, args.latency, args.seed)
+        base_url = stub.base_url
+    client = OpenAI(api_key="stub", base_url=base_url, max_retries=0)
+
+    init_inference_threads()
+    warm_up("warm up")
+    print(f"LLM endpoint: {base_url}")
+    print(f"{'sessions':>9}{'turns/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'audit p95':>11}{'MB/sess':>9}{'errors':>8}")
+    levels = []
+    for n in args.sessions:
+        r = run_level(client, n, args.turns, args.mode, args.think_ms, os.path.join(work_dir, "sessions"))
+        lat = r["latency_ms"]["total"]
+        print(f"{n:>9}{r['turns_per_s'] or 0:>9.2f}{lat['p50']:>9.0f}{lat['p95']:>9.0f}{lat['p99']:>9.0f}"
+              f"{r['latency_ms']['audit']['p95']:>11.0f}{r['rss_per_session_mb']:>9.2f}{r['errors']:>8}", flush=True)
+        levels.append(r)
+
+    # highest level reached without a failing level below it
+    capacity = 0
+    for r in sorted(levels, key=lambda r: r["sessions"]):
+        if r["errors"] or r["latency_ms"]["total"]["p95"] > args.slo_ms:
+            break
+        capacity = r["sessions"]
+    print(f"Sustained at p95 <= {args.slo_ms:.0f} ms: {capacity} concurrent session(s)")
+
+    payload = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "capacity_sessions": capacity,
+        "levels": levels,
+    }
+    with open(args.out, "w") as f:
+        json.dump(payload, f, indent=2)
+    print("Saved:", args.out)
+
+    if stub is not None:
+        stub.shutdown()
+    events.WRITER.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.corpus import DENSITIES, LENGTHS, make_corpus, make_labelled
+from services.detector import _rule_assess, assess
+from utils.helpers import render_highlighted
+
+# Each benchmark runs for at least MIN_TIME seconds (and MIN_ITERS calls),
+# capped at MAX_ITERS calls.
+MIN_TIME = 0.5
+MIN_ITERS = 5
+MAX_ITERS = 10_000
+CORPUS_SIZE = 32
+
+
+def _peak_rss_mb() -> float:
+    # process-lifetime high-water mark, so it never falls between cases
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _percentile(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def measure(name: str, fn, inputs: list, items_per_call: int = 1, **params) -> dict:
+    """Time fn(x) cycling over `inputs`; latency is per call, ops/s is per item."""
+    rss0 = _peak_rss_mb()
+    fn(inputs[0])  # warm-up (lazy model loads, regex compiles)
+    lat: list[float] = []
+    start = time.perf_counter()
+    i = 0
+    while i < MAX_ITERS and (i < MIN_ITERS or time.perf_counter() - start < MIN_TIME):
+        x = inputs[i % len(inputs)]
+        t0 = time.perf_counter()
+        fn(x)
+        lat.append(time.perf_counter() - t0)
+        i += 1
+    total = sum(lat)
+    lat.sort()
+    return {
+        "name": name,
+        "params": params,
+        "calls": len(lat),
+        "ops_per_s": (len(lat) * items_per_call) / total if total > 0 else None,
+        "latency_ms": {
+            "mean": 1000.0 * total / len(lat),
+            "p50": 1000.0 * _percentile(lat, 0.50),
+            "p90": 1000.0 * _percentile(lat, 0.90),
+            "p99": 1000.0 * _percentile(lat, 0.99),
+            "max": 1000.0 * lat[-1],
+        },
+        # cumulative over every case run so far; growth is how far this case raised it
+        "peak_rss_mb_cumulative": _peak_rss_mb(),
+        "peak_rss_growth_mb": _peak_rss_mb() - rss0,
+    }
+
+
+def bench_rules(results: list[dict]) -> None:
+    for length in LENGTHS:
+        for density in DENSITIES:
+            corpus = make_corpus(CORPUS_SIZE, length, density)
+            p = {"length": length, "density": density}
+            results.append(measure("rule_assess", _rule_assess, corpus, **p))
+            results.append(measure(
+                "assess", lambda t: assess("", t, model_proba=0.6, model_threshold=0.5), corpus, **p,
+            ))
+            spans = [assess("", t, model_proba=0.9, model_threshold=0.5).spans for t in corpus]
+            pairs = list(zip(corpus, spans))
+            results.append(measure("render_highlighted", lambda tp: render_highlighted(*tp), pairs, **p))
+
+
+def bench_model(results: list[dict], batch_size: int) -> None:
+    from data.tune_threshold import find_best_threshold
+    from services.batch import raw_signals, score_frame
+    from services.sbert_lr import predict_proba, predict_proba_batch
+
+    for length in (50, 500, 5_000):
+        corpus = make_corpus(CORPUS_SIZE, length, 1.0)
+        results.append(measure("predict_proba", predict_proba, corpus, length=length))
+        batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+        results.append(measure(
+            "predict_proba_batch", predict_proba_batch, batches,
+            items_per_call=batch_size, length=length, batch_size=batch_size,
+        ))
+
+    texts, labels = make_labelled(200)
+    results.append(measure(
+        "tune_threshold", lambda tl: find_best_threshold(*tl), [(texts, labels)],
+        items_per_call=len(texts), rows=len(texts),
+    ))
+
+    batch = make_corpus(512, 500, 1.0)
+    results.append(measure(
+        "batch_end_to_end", lambda ts: score_frame(raw_signals(ts), 0.5), [batch],
+        items_per_call=len(batch), rows=len(batch), length=500,
+    ))
+
+
+def compare(current: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        base = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    print(f"\n{'benchmark':<48}{'ops/s':>12}{'baseline':>12}{'change':>9}")
+    for r in current:
+        key = (r["name"], json.dumps(r["params"], sort_keys=True))
+        b = base.get(key)
+        label = r["name"] + " " + ",".join(f"{k}={v}" for k, v in r["params"].items())
+        if b is None or not b["ops_per_s"] or not r["ops_per_s"]:
+            print(f"{label:<48}{r['ops_per_s'] or 0:>12.1f}{'-':>12}{'':>9}")
+            continue
+        delta = (r["ops_per_s"] - b["ops_per_s"]) / b["ops_per_s"]
+        print(f"{label:<48}{r['ops_per_s']:>12.1f}{b['ops_per_s']:>12.1f}{delta:>+9.1%}")
+
+
+def main():
+    global MIN_TIME
+    ap = argparse.ArgumentParser(description="Benchmark the detection pipeline.")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", default=None, help="baseline results JSON to diff against")
+    ap.add_argument("--skip_model", action="store_true", help="rules/rendering only; no embedder load")
+    ap.add_argument("--batch_size", type=int, default=32)
+    ap.add_argument("--min_time", type=float, default=MIN_TIME)
+    args = ap.parse_args()
+    MIN_TIME = args.min_time
+
+    results: list[dict] = []
+    bench_rules(results)
+    if not args.skip_model:
+        bench_model(results, args.batch_size)
+
+    payload = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "min_time": MIN_TIME,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(payload, f, indent=2)
+
+    for r in results:
+        params = ",".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{r['name']:<22}{params:<30}{r['ops_per_s'] or 0:>12.1f} ops/s  p99 {r['latency_ms']['p99']:.3f} ms")
+    print("Saved:", args.out)
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
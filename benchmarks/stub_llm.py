@@ -0,0 +1,178 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import pandas as pd
+
+from benchmarks.corpus import SEED, make_text
+
+# Share of synthetic replies with planted coercive phrases, and their length range (chars).
+COERCIVE_SHARE = 0.3
+COERCIVE_DENSITY = 8.0
+REPLY_LENGTHS = (200, 1500)
+CORPUS_REPLIES = 500
+DEFAULT_LATENCY = "lognormal:800,0.4"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency sampler in seconds from "fixed:MS", "uniform:LO,HI" or
+    "lognormal:MEDIAN,SIGMA" (milliseconds; sigma of the underlying normal).
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        vals = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"bad latency spec: {spec}")
+    if kind == "fixed" and len(vals) == 1:
+        return lambda rng: vals[0] / 1000.0
+    if kind == "uniform" and len(vals) == 2:
+        return lambda rng: rng.uniform(vals[0], vals[1]) / 1000.0
+    if kind == "lognormal" and len(vals) == 2:
+        mu = math.log(max(vals[0], 1e-3))
+        return lambda rng: rng.lognormvariate(mu, vals[1]) / 1000.0
+    raise ValueError(f"bad latency spec: {spec}")
+
+
+def reply_corpus(
+    csv: str | None = None,
+    text_col: str = "assistant_reply",
+    coercive_share: float = COERCIVE_SHARE,
+    n: int = CORPUS_REPLIES,
+    seed: int = SEED,
+) -> list[str]:
+    """Replies from a CSV column, or synthetic filler with coercive phrases planted in `coercive_share` of them."""
+    if csv:
+        texts = pd.read_csv(csv, usecols=[text_col])[text_col].dropna().astype(str).tolist()
+        if not texts:
+            raise ValueError(f"no replies in {csv}:{text_col}")
+        return texts
+    rng = random.Random(f"{seed}:stub-llm")
+    return [
+        make_text(rng.randint(*REPLY_LENGTHS), COERCIVE_DENSITY if rng.random() < coercive_share else 0.0, rng)
+        for _ in range(n)
+    ]
+
+
+def response_object(text: str, model: str, input_tokens: int) -> dict:
+    """Minimal Responses API payload; the SDK's `output_text` reads output[].content[]."""
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "error": None,
+        "incomplete_details": None,
+        "instructions": None,
+        "metadata": {},
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, addr, corpus: list[str], latency: str = DEFAULT_LATENCY, seed: int = SEED):
+        super().__init__(addr, StubLLMHandler)
+        self.corpus = corpus
+        self.sample_latency = parse_latency(latency)
+        # one seeded stream, so a run's sequence of replies and delays is repeatable
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def next_reply(self) -> tuple[str, float]:
+        with self._lock:
+            self.requests += 1
+            return self._rng.choice(self.corpus), self.sample_latency(self._rng)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    server: StubLLMServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/responses":
+            self._send(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "body is not valid JSON", "type": "invalid_request_error"}})
+            return
+        text, delay = self.server.next_reply()
+        time.sleep(delay)
+        prompt_chars = len(json.dumps(body.get("input", "")))
+        self._send(200, response_object(text, str(body.get("model", "stub")), max(1, prompt_chars // 4)))
+
+
+def serve(host: str, port: int, corpus: list[str], latency: str = DEFAULT_LATENCY, seed: int = SEED) -> StubLLMServer:
+    """Start the stub on a daemon thread; port 0 picks a free port (see .base_url)."""
+    srv = StubLLMServer((host, port), corpus, latency, seed)
+    threading.Thread(target=srv.serve_forever, name="ecg-stub-llm", daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stand-in for the OpenAI Responses API with configurable latency.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", default=DEFAULT_LATENCY, help="fixed:MS, uniform:LO,HI or lognormal:MEDIAN,SIGMA")
+    ap.add_argument("--corpus_csv", default=None, help="serve replies from this CSV instead of synthetic text")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--coercive_share", type=float, default=COERCIVE_SHARE)
+    ap.add_argument("--seed", type=int, default=SEED)
+    args = ap.parse_args()
+
+    corpus = reply_corpus(args.corpus_csv, args.text_col, args.coercive_share, seed=args.seed)
+    parse_latency(args.latency)
+    srv = StubLLMServer((args.host, args.port), corpus, args.latency, args.seed)
+    print(f"Stub LLM at {srv.base_url} ({len(corpus)} replies, latency {args.latency})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+
+from services.arrow_io import TableWriter, detect_format
+from services.batch import iter_raw_signals, score_frame
+from services.jobs import SHARD_ROWS, BatchJob
+from utils.config import BATCH_JOBS_DIR, load_threshold, mode_threshold
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumable batch risk audit over a CSV/Parquet/Arrow file of replies.")
+    ap.add_argument("--csv", required=True, help="input file (.csv, .parquet or .arrow/.feather)")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--out", required=True, help="output file; format follows the extension")
+    ap.add_argument("--mode", default="Balanced", choices=["Conservative", "Balanced", "Aggressive"])
+    ap.add_argument("--jobs_dir", default=BATCH_JOBS_DIR)
+    ap.add_argument("--shard_rows", type=int, default=SHARD_ROWS)
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--near_dupes", action="store_true")
+    ap.add_argument("--keep_job", action="store_true", help="keep shard outputs after a successful merge")
+    args = ap.parse_args()
+
+    job = BatchJob.for_file(
+        args.csv,
+        args.text_col,
+        jobs_dir=args.jobs_dir,
+        shard_rows=args.shard_rows,
+        limit=args.limit,
+        near_dupes=args.near_dupes,
+    )
+    done = job.completed_shards()
+    print(f"Job dir: {job.job_dir} ({len(done)} shard(s) already complete)")
+
+    def _on_progress(rows: int, scored_now: int) -> None:
+        print(f"  {rows:,} rows ({scored_now:,} scored this run)", flush=True)
+
+    n = job.run(on_progress=_on_progress)
+    if n == 0:
+        print("No rows to audit.")
+        return
+
+    raw_path = job.merge(os.path.join(job.job_dir, "raw_signals.csv"))
+    th = mode_threshold(load_threshold(), args.mode)
+
+    tmp = args.out + ".tmp"
+    with TableWriter(tmp, detect_format(args.out)) as w:
+        for raw in iter_raw_signals(raw_path):
+            w.write(score_frame(raw, th, args.mode))
+    os.replace(tmp, args.out)
+
+    _, unique = job.dedup_stats()
+    print(f"Saved: {args.out} ({n:,} rows, {unique:,} scored)")
+
+    if not args.keep_job:
+        job.cleanup()
+
+if __name__ == "__main__":
+    main()
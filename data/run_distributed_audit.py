@@ -0,0 +1,184 @@
+import argparse
+import filecmp
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from services.arrow_io import TableWriter, detect_format
+from services.batch import iter_raw_signals, score_frame
+from services.jobs import LEASE_SECONDS, POLL_SECONDS, SHARD_ROWS, BatchJob, DistributedJob, worker_id
+from utils.config import load_threshold, mode_threshold
+
+SELFCHECK_TEXTS = [
+    "You must decide right now or you will regret it.",
+    "Take your time and choose whatever works best for you.",
+    "Everyone else already agreed, so you have no real choice.",
+    "Here are a few options; it is entirely up to you.",
+    "If you don't act today, this chance is gone forever.",
+]
+
+def coordinate(args) -> None:
+    job = DistributedJob(
+        args.job_dir,
+        args.csv,
+        args.text_col,
+        shard_rows=args.shard_rows,
+        limit=args.limit,
+        near_dupes=args.near_dupes,
+        lease_seconds=args.lease_seconds,
+    )
+    n_shards = job.plan()
+    print(f"Job dir: {job.job_dir} ({n_shards} shard(s), {len(job.completed_shards())} already complete)")
+    if job.manifest["n_rows"] == 0:
+        print("No rows to audit.")
+        return
+
+    # local workers are a convenience; workers on other hosts join with the `worker` command
+    procs = _spawn_workers(args.job_dir, args.workers, args.lease_seconds)
+    try:
+        last = -1
+        while not job.is_complete:
+            for k in job.reclaim_expired():
+                print(f"  reclaimed expired lease on shard {k}", flush=True)
+            done = len(job.completed_shards())
+            if done != last:
+                print(f"  {done}/{n_shards} shards complete", flush=True)
+                last = done
+            if procs and all(p.poll() is not None for p in procs):
+                raise SystemExit("all local workers exited before the job completed")
+            time.sleep(POLL_SECONDS)
+    finally:
+        for p in procs:
+            p.wait()
+
+    raw_path = job.merge(os.path.join(job.job_dir, "raw_signals.csv"))
+    th = mode_threshold(load_threshold(), args.mode)
+
+    tmp = args.out + ".tmp"
+    with TableWriter(tmp, detect_format(args.out)) as w:
+        for raw in iter_raw_signals(raw_path):
+            w.write(score_frame(raw, th, args.mode))
+    os.replace(tmp, args.out)
+
+    _, unique = job.dedup_stats()
+    print(f"Saved: {args.out} ({job.manifest['n_rows']:,} rows, {unique:,} scored)")
+
+    if not args.keep_job:
+        job.cleanup()
+
+def work(args) -> None:
+    job = DistributedJob.open(args.job_dir, lease_seconds=args.lease_seconds)
+    worker = worker_id()
+
+    def _on_shard(k: int, rows: int) -> None:
+        print(f"  [{worker}] shard {k} done ({rows:,} rows)", flush=True)
+
+    n = job.work(worker, on_shard=_on_shard)
+    print(f"  [{worker}] finished, {n} shard(s) scored", flush=True)
+
+def _spawn_workers(job_dir: str, n: int, lease_seconds: float) -> list[subprocess.Popen]:
+    return [
+        subprocess.Popen([sys.executable, "-m", "data.run_distributed_audit", "worker",
+                          "--job_dir", job_dir, "--lease_seconds", str(lease_seconds)])
+        for _ in range(n)
+    ]
+
+def _check(ok: bool, what: str) -> None:
+    if not ok:
+        raise SystemExit(f"FAILED: {what}")
+    print(f"ok: {what}", flush=True)
+
+def selfcheck(args) -> None:
+    """
+    Claim, expiry, reclaim and a two-worker run on a small generated input,
+    checked against the single-process BatchJob on the same shards.
+    """
+    root = tempfile.mkdtemp(prefix="ecg-dist-check-")
+    try:
+        rng = random.Random(0)
+        csv = os.path.join(root, "input.csv")
+        pd.DataFrame({"text": [rng.choice(SELFCHECK_TEXTS) + f" ({rng.randint(0, args.rows // 2)})"
+                               for _ in range(args.rows)]}).to_csv(csv, index=False)
+
+        single = BatchJob(os.path.join(root, "single"), csv, "text", shard_rows=args.shard_rows)
+        single.run()
+        expected = single.merge(os.path.join(root, "single.csv"))
+
+        job_dir = os.path.join(root, "distributed")
+        short = DistributedJob(job_dir, csv, "text", shard_rows=args.shard_rows, lease_seconds=1.0)
+        n_shards = short.plan()
+        _check(n_shards >= 2, f"planned {n_shards} shards")
+
+        k = short.claim("dead-worker")
+        other = short.claim("other-worker")
+        _check(k == 0 and other == 1, "two claims get two different shards")
+        short.release(other, "dead-worker")
+        _check(os.path.exists(short.lease_path(other)), "a worker cannot release a lease it does not hold")
+        short.release(other, "other-worker")
+        _check(short.reclaim_expired() == [], "a live lease is not reclaimed")
+        time.sleep(1.5)
+        _check(short.reclaim_expired() == [k], "an expired lease is reclaimed")
+        _check(short.claim("new-worker") == k, "a reclaimed shard can be claimed again")
+        short.release(k, "new-worker")
+
+        procs = _spawn_workers(job_dir, 2, LEASE_SECONDS)
+        codes = [p.wait() for p in procs]
+        _check(codes == [0, 0], "both workers exit cleanly")
+        job = DistributedJob.open(job_dir)
+        _check(job.is_complete, "every shard is complete")
+        merged = job.merge(os.path.join(root, "distributed.csv"))
+        _check(filecmp.cmp(expected, merged, shallow=False), "two-worker merge equals the single-process output")
+
+        # a worker attached to a job that is merged and removed under it exits normally
+        late = DistributedJob.open(job_dir)
+        job.cleanup()
+        _check(late.work("late-worker") == 0, "a worker exits when the job directory is removed")
+        print("Self-check passed.")
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+        else:
+            print("Kept:", root)
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch risk audit split across worker processes sharing a job directory.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    c = sub.add_parser("coordinate", help="plan the job, reclaim expired leases, then merge and score")
+    c.add_argument("--csv", required=True, help="input file (.csv, .parquet or .arrow/.feather)")
+    c.add_argument("--text_col", default="assistant_reply")
+    c.add_argument("--out", required=True, help="output file; format follows the extension")
+    c.add_argument("--job_dir", required=True, help="directory on a filesystem every worker can reach")
+    c.add_argument("--mode", default="Balanced", choices=["Conservative", "Balanced", "Aggressive"])
+    c.add_argument("--shard_rows", type=int, default=SHARD_ROWS)
+    c.add_argument("--limit", type=int, default=None)
+    c.add_argument("--near_dupes", action="store_true")
+    c.add_argument("--workers", type=int, default=0, help="local worker processes to start")
+    c.add_argument("--lease_seconds", type=float, default=LEASE_SECONDS)
+    c.add_argument("--keep_job", action="store_true", help="keep shard outputs after a successful merge")
+
+    w = sub.add_parser("worker", help="claim and score shards until the job is complete")
+    w.add_argument("--job_dir", required=True)
+    w.add_argument("--lease_seconds", type=float, default=LEASE_SECONDS)
+
+    s = sub.add_parser("selfcheck", help="check leasing and a two-worker run against single-process output")
+    s.add_argument("--rows", type=int, default=200)
+    s.add_argument("--shard_rows", type=int, default=50)
+    s.add_argument("--keep", action="store_true", help="keep the temporary job directories")
+    args = ap.parse_args()
+
+    if args.command == "coordinate":
+        coordinate(args)
+    elif args.command == "worker":
+        work(args)
+    else:
+        selfcheck(args)
+
+if __name__ == "__main__":
+    main()
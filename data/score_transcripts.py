@@ -0,0 +1,51 @@
+import argparse
+import os
+
+from services.arrow_io import TableWriter, detect_format, iter_column_chunks
+from services.batch import BATCH_CHUNK_ROWS
+from services.transcripts import TranscriptScorer, score_transcripts
+from utils.config import load_threshold, mode_threshold
+
+def main():
+    ap = argparse.ArgumentParser(description="Score every assistant turn of Human:/Assistant: transcripts.")
+    ap.add_argument("--input", required=True, help="input file (.csv, .parquet or .arrow/.feather)")
+    ap.add_argument("--text_col", default="chosen", help="column holding the full transcript")
+    ap.add_argument("--id_col", default=None, help="conversation id column (default: row position)")
+    ap.add_argument("--out_turns", required=True, help="per-turn output; format follows the extension")
+    ap.add_argument("--out_conversations", required=True, help="per-conversation output")
+    ap.add_argument("--mode", default="Balanced", choices=["Conservative", "Balanced", "Aggressive"])
+    ap.add_argument("--chunk_turns", type=int, default=BATCH_CHUNK_ROWS)
+    ap.add_argument("--limit", type=int, default=None, help="max transcripts to read")
+    args = ap.parse_args()
+
+    th = mode_threshold(load_threshold(), args.mode)
+    columns = [args.text_col] + ([args.id_col] if args.id_col else [])
+    # hh-rlhf transcripts average a few assistant turns each
+    chunks = iter_column_chunks(args.input, columns, max(1, args.chunk_turns // 4))
+
+    def _on_progress(transcripts: int, turns: int) -> None:
+        print(f"  {transcripts:,} transcripts, {turns:,} turns scored", flush=True)
+
+    turns_tmp = args.out_turns + ".tmp"
+    convs_tmp = args.out_conversations + ".tmp"
+    with TableWriter(turns_tmp, detect_format(args.out_turns)) as tw, \
+            TableWriter(convs_tmp, detect_format(args.out_conversations)) as cw:
+        scorer = TranscriptScorer(tw, cw, th, args.mode, args.chunk_turns)
+        n_transcripts, n_turns = score_transcripts(
+            chunks, args.text_col, scorer, id_col=args.id_col, limit=args.limit, on_progress=_on_progress,
+        )
+
+    if n_turns == 0:
+        for p in (turns_tmp, convs_tmp):
+            if os.path.exists(p):
+                os.remove(p)
+        print("No assistant turns found.")
+        return
+
+    os.replace(turns_tmp, args.out_turns)
+    os.replace(convs_tmp, args.out_conversations)
+    print(f"Saved: {args.out_turns} ({n_turns:,} turns)")
+    print(f"Saved: {args.out_conversations} ({scorer.n_conversations:,} conversations from {n_transcripts:,} transcripts)")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import argparse
 import json
 import numpy as np
-import pandas as pd
 from sklearn.metrics import f1_score
-from services.sbert_lr import predict_proba
+from services.datasets import dataset_for
+from services.sbert_lr import predict_proba, proba_from_embeddings
 
 def find_best_threshold(texts, labels):
     probs = np.array([predict_proba(t) for t in texts])
+    return best_threshold_from_probs(probs, labels)
+
+def best_threshold_from_probs(probs, labels):
+    probs = np.asarray(probs)
     labels = np.array(labels)
 
     best_th = 0.5
@@ -30,18 +34,16 @@ def main():
 
     args = parser.parse_args()
 
-    df = pd.read_csv(args.csv)
-    df = df.dropna(subset=[args.text_col, args.label_col])
-
-    texts = df[args.text_col].astype(str).tolist()
-    labels = df[args.label_col].astype(int).tolist()
+    ds = dataset_for(args.csv, args.text_col, args.label_col)
+    labels = ds.labels
+    probs = proba_from_embeddings(ds.embeddings())
 
-    best_th, best_f1 = find_best_threshold(texts, labels)
+    best_th, best_f1 = best_threshold_from_probs(probs, labels)
 
     result = {
         "threshold": float(best_th),
         "best_f1": float(best_f1),
-        "rows_used": len(texts)
+        "rows_used": len(ds)
     }
 
     with open(args.out, "w") as f:
@@ -0,0 +1,106 @@
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+import torch
+from sentence_transformers import SentenceTransformer
+from tokenizers import Tokenizer
+
+from services.sbert_lr import EMBEDDER_NAME, STATIC_EMBEDDER_PATH
+from services.static_embedder import StaticEmbedder
+
+SEED = 42
+# SIF weighting a / (a + p(token)): frequent word pieces count for less.
+SIF_A = 1e-3
+RIDGE_ALPHA = 1.0
+
+_SPECIAL = re.compile(r"^\[.*\]$")
+
+
+def token_vectors(model: SentenceTransformer, batch_size: int) -> np.ndarray:
+    """The full model's sentence embedding of every vocabulary entry, fed as [CLS] token [SEP]."""
+    tok = model.tokenizer
+    n = tok.vocab_size
+    out = np.zeros((n, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for start in range(0, n, batch_size):
+        ids = torch.tensor(
+            [[tok.cls_token_id, i, tok.sep_token_id] for i in range(start, min(n, start + batch_size))],
+            device=model.device,
+        )
+        features = {
+            "input_ids": ids,
+            "attention_mask": torch.ones_like(ids),
+            "token_type_ids": torch.zeros_like(ids),
+        }
+        with torch.no_grad():
+            out[start:start + len(ids)] = model(features)["sentence_embedding"].cpu().numpy()
+    return out
+
+
+def sif_weights(model: SentenceTransformer, texts: list[str]) -> np.ndarray:
+    tok = model.tokenizer
+    n = tok.vocab_size
+    counts = np.zeros(n, dtype=np.float64)
+    for ids in tok(texts, add_special_tokens=False)["input_ids"]:
+        np.add.at(counts, ids, 1)
+    p = counts / max(1.0, counts.sum())
+    weights = (SIF_A / (SIF_A + p)).astype(np.float32)
+    # special and [unusedN] entries never occur in running text
+    for i, t in enumerate(tok.convert_ids_to_tokens(list(range(n)))):
+        if _SPECIAL.match(t):
+            weights[i] = 0.0
+    return weights
+
+
+def fit_projection(pooled: np.ndarray, target: np.ndarray, alpha: float = RIDGE_ALPHA) -> np.ndarray:
+    """Ridge map from pooled static vectors to the full model's sentence embeddings."""
+    d = pooled.shape[1]
+    A = pooled.T @ pooled + alpha * np.eye(d, dtype=pooled.dtype)
+    return np.linalg.solve(A, pooled.T @ target).astype(np.float32)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Distill all-MiniLM-L6-v2 into a static word-piece embedder.")
+    ap.add_argument("--csv", default="data/hh_coercion_weak_labels.csv", help="corpus for weights and alignment")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--limit", type=int, default=20000, help="corpus rows used for the alignment fit")
+    ap.add_argument("--batch_size", type=int, default=512)
+    ap.add_argument("--out", default=STATIC_EMBEDDER_PATH)
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv, usecols=[args.text_col]).dropna()
+    texts = df[args.text_col].astype(str).sample(frac=1.0, random_state=SEED).tolist()[: args.limit]
+    n_val = max(1, len(texts) // 10)
+    fit_texts, val_texts = texts[n_val:], texts[:n_val]
+
+    model = SentenceTransformer(EMBEDDER_NAME)
+    print(f"Embedding {model.tokenizer.vocab_size} vocabulary entries...")
+    vectors = token_vectors(model, args.batch_size)
+    weights = sif_weights(model, fit_texts)
+
+    # pool with an identity projection, then fit the projection to the full model
+    dim = vectors.shape[1]
+    tokenizer_json = model.tokenizer.backend_tokenizer.to_str()
+    static = StaticEmbedder(Tokenizer.from_str(tokenizer_json), vectors, weights, np.eye(dim))
+    print(f"Aligning on {len(fit_texts)} texts...")
+    target = model.encode(fit_texts, batch_size=64, convert_to_numpy=True, show_progress_bar=True)
+    projection = fit_projection(static.encode(fit_texts), target)
+
+    static.projection = projection
+    val_full = model.encode(val_texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+    cos = np.sum(static.encode(val_texts) * val_full, axis=1)
+    print(f"Held-out cosine to full embeddings: mean {cos.mean():.4f}, p10 {np.percentile(cos, 10):.4f}")
+
+    np.savez_compressed(
+        args.out,
+        tokenizer=np.array(tokenizer_json),
+        vectors=vectors,
+        weights=weights,
+        projection=projection,
+        source=np.array(EMBEDDER_NAME),
+    )
+    print("Saved:", args.out)
+
+if __name__ == "__main__":
+    main()
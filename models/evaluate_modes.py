@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+
+from services.batch import fuse, raw_signals
+from services.detector import get_rules
+from utils.config import load_threshold, mode_threshold
+
+MODES = ["Conservative", "Balanced", "Aggressive"]
+
+def evaluate(raw: pd.DataFrame, y: np.ndarray, base_threshold: float, positive: str = "yellow") -> dict:
+    """
+    Score every mode from one set of raw signals. A row is predicted
+    coercive when its fused score reaches the mode's YELLOW (`low`) or,
+    with positive="red", RED (`high`) cut-off.
+    """
+    rules = get_rules()
+    cats = list(rules.category_markers.keys())
+    counts = np.column_stack([raw[f"n_{c}"].to_numpy() for c in cats])
+
+    out = {}
+    for mode in MODES:
+        cfg = rules.mode_configs[mode]
+        th = mode_threshold(base_threshold, mode)
+
+        t0 = time.perf_counter()
+        fused = fuse(raw, th, mode)
+        fuse_s = time.perf_counter() - t0
+
+        score = fused["risk_score"].to_numpy()
+        cut = cfg["high"] if positive == "red" else cfg["low"]
+        pred = (score >= cut).astype(int)
+
+        p, r, f1, _ = precision_recall_fscore_support(y, pred, average="binary", zero_division=0)
+        tn, fp, fn, tp = confusion_matrix(y, pred, labels=[0, 1]).ravel()
+
+        # categories are suppressed when the semantic model alone decides
+        shown = counts * (fused["model_score"].to_numpy() < cfg["model_only_gate"])[:, None]
+        hits = {}
+        for j, c in enumerate(cats):
+            hit = shown[:, j] > 0
+            hits[c] = {
+                "positives": float(hit[y == 1].mean()) if (y == 1).any() else None,
+                "negatives": float(hit[y == 0].mean()) if (y == 0).any() else None,
+            }
+
+        out[mode] = {
+            "model_threshold": float(th),
+            "score_cutoff": float(cut),
+            "precision": float(p),
+            "recall": float(r),
+            "f1": float(f1),
+            "confusion": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+            "category_hit_rate": hits,
+            "fuse_ms": 1000.0 * fuse_s,
+        }
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default="data/coercion_dataset_500_v1.csv")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--label_col", default="label")
+    ap.add_argument("--prompt_col", default=None)
+    ap.add_argument("--positive", default="yellow", choices=["yellow", "red"])
+    ap.add_argument("--out", default="models/mode_eval.json")
+    args = ap.parse_args()
+
+    cols = [args.text_col, args.label_col] + ([args.prompt_col] if args.prompt_col else [])
+    df = pd.read_csv(args.csv, usecols=cols).dropna(subset=[args.text_col, args.label_col])
+    texts = df[args.text_col].astype(str).tolist()
+    prompts = df[args.prompt_col].fillna("").astype(str).tolist() if args.prompt_col else None
+    y = df[args.label_col].astype(int).to_numpy()
+
+    # the only expensive step: one embedding + rule pass shared by all modes
+    t0 = time.perf_counter()
+    raw = raw_signals(texts, prompts)
+    signals_s = time.perf_counter() - t0
+
+    results = evaluate(raw, y, load_threshold(), args.positive)
+
+    payload = {
+        "csv": args.csv,
+        "rows": int(len(y)),
+        "positive": args.positive,
+        "base_threshold": load_threshold(),
+        "detector_config": get_rules().version,
+        "signals_s": signals_s,
+        "signals_ms_per_row": 1000.0 * signals_s / max(1, len(y)),
+        "modes": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(payload, f, indent=2)
+
+    print(f"{len(y)} rows, signals in {signals_s:.2f}s ({payload['signals_ms_per_row']:.2f} ms/row)")
+    print(f"{'mode':<14}{'precision':>10}{'recall':>10}{'f1':>10}{'tp':>6}{'fp':>6}{'fn':>6}{'tn':>6}")
+    for mode, m in results.items():
+        c = m["confusion"]
+        print(f"{mode:<14}{m['precision']:>10.4f}{m['recall']:>10.4f}{m['f1']:>10.4f}"
+              f"{c['tp']:>6}{c['fp']:>6}{c['fn']:>6}{c['tn']:>6}")
+    print("Saved:", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import itertools
+import json
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, f1_score, log_loss, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from services.datasets import dataset_for
+from services.sbert_lr import TIERS
+from utils.config import MAX_THRESHOLD, MIN_THRESHOLD
+
+SEED = 42
+
+C_GRID = [0.01, 0.1, 0.3, 1.0, 3.0, 10.0]
+CLASS_WEIGHTS = [None, "balanced"]
+CALIBRATIONS = ["none", "sigmoid", "isotonic"]
+# Only thresholds the app will actually use (load_threshold clamps to this range).
+THRESHOLDS = np.round(np.arange(MIN_THRESHOLD, MAX_THRESHOLD + 1e-9, 0.01), 2)
+
+
+def make_model(C: float, class_weight: str | None, calibration: str):
+    lr = LogisticRegression(max_iter=4000, C=C, class_weight=class_weight)
+    if calibration == "none":
+        return lr
+    return CalibratedClassifierCV(lr, method=calibration, cv=3)
+
+
+def _fit_fold(X: np.ndarray, y: np.ndarray, cfg: tuple, train_idx: np.ndarray, test_idx: np.ndarray):
+    model = make_model(*cfg)
+    model.fit(X[train_idx], y[train_idx])
+    return test_idx, model.predict_proba(X[test_idx])[:, 1]
+
+
+def best_threshold(y: np.ndarray, p: np.ndarray) -> tuple[float, float]:
+    f1s = [f1_score(y, p >= th, zero_division=0) for th in THRESHOLDS]
+    k = int(np.argmax(f1s))
+    return float(THRESHOLDS[k]), float(f1s[k])
+
+
+def search(X: np.ndarray, y: np.ndarray, folds: int, n_jobs: int) -> list[dict]:
+    """
+    Out-of-fold probabilities for every configuration, all (config, fold)
+    fits run in parallel over the same memory-mapped X. Each configuration
+    is then scored at its own best threshold.
+    """
+    configs = list(itertools.product(C_GRID, CLASS_WEIGHTS, CALIBRATIONS))
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=SEED).split(np.zeros(len(y)), y))
+
+    tasks = [(ci, cfg, tr, te) for ci, cfg in enumerate(configs) for tr, te in splits]
+    fits = Parallel(n_jobs=n_jobs)(delayed(_fit_fold)(X, y, cfg, tr, te) for _, cfg, tr, te in tasks)
+
+    oof = np.zeros((len(configs), len(y)), dtype=np.float64)
+    for (ci, _, _, _), (te, p) in zip(tasks, fits):
+        oof[ci, te] = p
+
+    results = []
+    for ci, (C, cw, cal) in enumerate(configs):
+        p = np.clip(oof[ci], 1e-7, 1 - 1e-7)
+        th, f1 = best_threshold(y, p)
+        results.append({
+            "C": C,
+            "class_weight": cw,
+            "calibration": cal,
+            "threshold": th,
+            "f1": f1,
+            "log_loss": float(log_loss(y, p)),
+            "brier": float(brier_score_loss(y, p)),
+            "auc": float(roc_auc_score(y, p)),
+        })
+    # best F1 at its own threshold; calibration quality breaks ties
+    results.sort(key=lambda r: (-round(r["f1"], 4), r["log_loss"]))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cross-validated search over LR strength, class weights and calibration.")
+    ap.add_argument("--csv", default="data/hh_coercion_weak_labels.csv")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--label_col", default="label")
+    ap.add_argument("--tier", default="full", choices=list(TIERS))
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--n_jobs", type=int, default=-1)
+    ap.add_argument("--out", default=None, help="chosen classifier; defaults to the tier's classifier path")
+    ap.add_argument("--threshold_out", default=None, help="also write the chosen threshold (e.g. models/threshold.json)")
+    ap.add_argument("--report", default="models/model_selection.json")
+    args = ap.parse_args()
+    embedder, default_out = TIERS[args.tier]
+    out = args.out or default_out
+
+    # the one expensive step: embedded once, cached with the dataset and memory-mapped
+    t0 = time.perf_counter()
+    ds = dataset_for(args.csv, args.text_col, args.label_col)
+    X = ds.embeddings(embedder)
+    y = ds.labels.astype(int)
+    embed_s = time.perf_counter() - t0
+    print(f"Embeddings ready for {len(ds)} rows in {embed_s:.1f}s")
+
+    t0 = time.perf_counter()
+    results = search(X, y, args.folds, args.n_jobs)
+    search_s = time.perf_counter() - t0
+    best = results[0]
+    print(f"Searched {len(results)} configurations x {args.folds} folds in {search_s:.1f}s")
+
+    model = make_model(best["C"], best["class_weight"], best["calibration"])
+    model.fit(X, y)
+    joblib.dump(model, out)
+
+    report = {
+        "csv": args.csv,
+        "rows": int(len(y)),
+        "tier": args.tier,
+        "folds": args.folds,
+        "embed_s": embed_s,
+        "search_s": search_s,
+        "chosen": best,
+        "model_path": out,
+        "results": results,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.threshold_out:
+        with open(args.threshold_out, "w") as f:
+            json.dump({"threshold": best["threshold"], "cv_f1": best["f1"], "rows_used": int(len(y)),
+                       "model_path": out}, f, indent=2)
+
+    print(f"{'C':>7}{'weights':>10}{'calib':>10}{'th':>6}{'f1':>8}{'logloss':>9}{'auc':>8}")
+    for r in results[:10]:
+        print(f"{r['C']:>7g}{str(r['class_weight']):>10}{r['calibration']:>10}{r['threshold']:>6.2f}"
+              f"{r['f1']:>8.4f}{r['log_loss']:>9.4f}{r['auc']:>8.4f}")
+    print("Saved:", out)
+    print("Saved:", args.report)
+    if args.threshold_out:
+        print("Saved:", args.threshold_out)
+
+if __name__ == "__main__":
+    main()
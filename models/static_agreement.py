@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+
+from services.batch import label_from_scores, raw_signals, fuse
+from services.sbert_lr import PRESCREEN_BAND, STATIC_THRESHOLD_PATH, predict_proba_batch
+from utils.config import load_threshold, mode_threshold
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Agreement of the static-embedding tier with the full model.")
+    ap.add_argument("--csv", default="data/coercion_dataset_500_v1.csv")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--label_col", default="label", help="optional; adds F1 against labels when present")
+    ap.add_argument("--mode", default="Balanced", choices=["Conservative", "Balanced", "Aggressive"])
+    ap.add_argument("--band", type=float, nargs=2, default=list(PRESCREEN_BAND), help="pre-screen band sent to the full model")
+    ap.add_argument("--static_threshold", default=STATIC_THRESHOLD_PATH, help="threshold saved with the static head")
+    ap.add_argument("--out", default="models/static_agreement.json")
+    args = ap.parse_args()
+    if not os.path.exists(args.static_threshold):
+        ap.error(f"{args.static_threshold} not found; run python -m models.train_lr_hh --tier static first")
+
+    df = pd.read_csv(args.csv).dropna(subset=[args.text_col])
+    texts = df[args.text_col].astype(str).tolist()
+    # each head is judged at its own tuned threshold, as the app would use it
+    th = mode_threshold(load_threshold(), args.mode)
+    th_static = mode_threshold(load_threshold(args.static_threshold), args.mode)
+
+    # raw signals carry the full model's probability; the static run swaps only that column
+    raw, full_s = _timed(raw_signals, texts)
+    p_full = raw["model_proba"].to_numpy()
+    predict_proba_batch(texts[:8], tier="static")  # load before timing
+    p_static, static_s = _timed(predict_proba_batch, texts, batch_size=1024, tier="static")
+
+    raw_static = raw.copy()
+    raw_static["model_proba"] = p_static
+    lab_full = label_from_scores(fuse(raw, th, args.mode)["risk_score"].to_numpy())
+    lab_static = label_from_scores(fuse(raw_static, th_static, args.mode)["risk_score"].to_numpy())
+    hit_full, hit_static = p_full >= th, p_static >= th_static
+
+    # forwarded rows are decided by the full head at its threshold, the rest by the static head at its own
+    lo, hi = args.band
+    forwarded = (p_static > lo) & (p_static < hi)
+    lab_cascade = np.where(forwarded, lab_full, lab_static)
+    hit_cascade = np.where(forwarded, hit_full, hit_static)
+
+    n = len(texts)
+    report = {
+        "csv": args.csv,
+        "rows": n,
+        "mode": args.mode,
+        "model_threshold": {"full": th, "static": th_static},
+        "proba_pearson": float(np.corrcoef(p_full, p_static)[0, 1]) if n > 1 else None,
+        "proba_mae": float(np.abs(p_full - p_static).mean()),
+        "decision_agreement": float((hit_full == hit_static).mean()),
+        "label_agreement": float((lab_full == lab_static).mean()),
+        "label_confusion": pd.crosstab(
+            pd.Series(lab_full, name="full"), pd.Series(lab_static, name="static")
+        ).to_dict(),
+        "prescreen": {
+            "band": [lo, hi],
+            "forwarded_rate": float(forwarded.mean()),
+            "label_agreement": float((lab_full == lab_cascade).mean()),
+        },
+        # full includes the rule pass of raw_signals; static is the classifier alone
+        "rows_per_s": {"full_with_rules": n / full_s, "static": n / static_s},
+    }
+    if args.label_col in df.columns:
+        y = df[args.label_col].astype(int).to_numpy()
+        report["f1_vs_labels"] = {
+            "full": float(f1_score(y, hit_full, zero_division=0)),
+            "static": float(f1_score(y, hit_static, zero_division=0)),
+            "prescreen": float(f1_score(y, hit_cascade, zero_division=0)),
+        }
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if k != "label_confusion"}, indent=2))
+    print("Saved:", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,49 @@
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.model_selection import train_test_split
+import argparse
+import json
+
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report
 import joblib
 
-SEED = 42
+from services.datasets import dataset_for
+from models.select_model import best_threshold
+from services.sbert_lr import STATIC_THRESHOLD_PATH, TIERS
+
+def main():
+    ap = argparse.ArgumentParser(description="Train the coercion LR head on sentence embeddings.")
+    ap.add_argument("--tier", default="full", choices=list(TIERS), help="embedder the head is trained for")
+    ap.add_argument("--csv", default="data/hh_coercion_weak_labels.csv")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--label_col", default="label")
+    ap.add_argument("--out", default=None, help="defaults to the tier's classifier path")
+    ap.add_argument("--threshold_out", default=None, help=f"static tier: where its tuned threshold goes (default {STATIC_THRESHOLD_PATH})")
+    args = ap.parse_args()
+    embedder, default_out = TIERS[args.tier]
+    out = args.out or default_out
 
-df = pd.read_csv("data/hh_coercion_weak_labels.csv")
-texts = df["assistant_reply"].astype(str).tolist()
-y = df["label"].astype(int).values
+    # converted once to Arrow; each distinct reply is embedded once and cached with it
+    ds = dataset_for(args.csv, args.text_col, args.label_col)
+    print(f"{len(ds)} rows, {ds.meta['unique_texts']} unique texts ({ds.path})")
+    X = ds.embeddings(embedder)
+    y = ds.labels
+    train, test = ds.split("train"), ds.split("val")
 
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-X = embedder.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+    model = LogisticRegression(max_iter=4000, C=1.0)
+    model.fit(X[train], y[train])
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=SEED, stratify=y
-)
+    pred = model.predict(X[test])
+    print(classification_report(y[test], pred, digits=4))
 
-model = LogisticRegression(max_iter=4000, C=1.0)
-model.fit(X_train, y_train)
+    joblib.dump(model, out)
+    print("Saved:", out)
 
-pred = model.predict(X_test)
-print(classification_report(y_test, pred, digits=4))
+    # the full head's threshold is models/threshold.json (select_model / tune_threshold)
+    if args.tier == "static":
+        th, f1 = best_threshold(y[test], model.predict_proba(X[test])[:, 1])
+        threshold_out = args.threshold_out or STATIC_THRESHOLD_PATH
+        with open(threshold_out, "w") as f:
+            json.dump({"threshold": th, "val_f1": f1, "n_val": int(len(test)), "tier": args.tier, "csv": args.csv}, f, indent=2)
+        print(f"Threshold {th:.2f} (val F1 {f1:.4f}) saved: {threshold_out}")
 
-joblib.dump(model, "models/lr_coercion.joblib")
-print("Saved: models/lr_coercion.joblib")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import json
 import argparse
-import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import f1_score
-from services.sbert_lr import predict_proba
+from services.datasets import dataset_for
+from services.sbert_lr import proba_from_embeddings
 
 def main():
     ap = argparse.ArgumentParser()
@@ -13,24 +12,15 @@ def main():
     ap.add_argument("--out", default="models/coercion_threshold.json")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
-    df = df[[args.text_col, args.label_col]].dropna()
-    df[args.label_col] = df[args.label_col].astype(int)
+    ds = dataset_for(args.csv, args.text_col, args.label_col)
+    val = ds.split("val")
 
-    _, val = train_test_split(
-        df,
-        test_size=0.2,
-        random_state=42,
-        stratify=df[args.label_col],
-    )
-
-    y = val[args.label_col].values
-    texts = val[args.text_col].astype(str).tolist()
-    probs = [float(predict_proba(t)) for t in texts]
+    y = ds.labels[val]
+    probs = proba_from_embeddings(ds.embeddings()[val])
 
     best = {"threshold": 0.5, "f1": -1.0}
     for th in [i / 100 for i in range(10, 91)]:
-        preds = [1 if p >= th else 0 for p in probs]
+        preds = (probs >= th).astype(int)
         f1 = f1_score(y, preds)
         if f1 > best["f1"]:
             best = {"threshold": th, "f1": float(f1)}
@@ -50,4 +40,4 @@ def main():
     print(json.dumps(payload, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,34 @@
+import hashlib
+import os
+import tempfile
+
 import pandas as pd
 import streamlit as st
 
-from services.detector import assess
-from services.sbert_lr import predict_proba
-from utils.config import load_threshold
+from services.arrow_io import (
+    MIME_TYPES,
+    OUTPUT_EXTENSIONS,
+    TableWriter,
+    count_rows,
+    detect_format,
+    read_columns,
+)
+from services.batch import (
+    Throughput,
+    TopK,
+    iter_raw_signals,
+    raw_signals,
+    score_frame,
+)
+from services.jobs import BatchJob, sweep_jobs_dir
+from utils.config import BATCH_JOBS_DIR, load_threshold, mode_threshold
 
 st.set_page_config(page_title="Quick Risk Check - Ethical Chat Guard", layout="wide")
 
+TOP_K_PREVIEW = 50
+OUTPUT_FORMATS = {"CSV": "csv", "Parquet": "parquet", "Arrow IPC": "arrow"}
+BATCH_SHARD_ROWS = 2000
+
 # -------------------- CSS --------------------
 st.markdown(
     """
@@ -82,20 +104,6 @@ st.markdown(
 )
 
 # -------------------- Helpers --------------------
-def _mode_threshold(base_th: float, mode: str) -> float:
-    if mode == "Conservative":
-        return min(0.95, base_th + 0.10)
-    if mode == "Aggressive":
-        return max(0.01, base_th - 0.10)
-    return base_th
-
-def _label_from_score(score: int) -> str:
-    if score <= 25:
-        return "GREEN"
-    if score <= 40:
-        return "YELLOW"
-    return "RED"
-
 def _pill(label: str) -> str:
     label = label.upper()
     if label == "RED":
@@ -111,6 +119,83 @@ def _label_meaning(label: str) -> str:
         return "Caution: some pressure cues detected; review tone and framing."
     return "Safe: response appears neutral and non-coercive."
 
+_LABEL_MEANINGS = {label: _label_meaning(label) for label in ("GREEN", "YELLOW", "RED")}
+
+def _results_frame(raw: pd.DataFrame, mode: str) -> pd.DataFrame:
+    """Fuse cached raw signals for `mode`; no re-embedding on mode switches."""
+    out = score_frame(raw, mode_threshold(load_threshold(), mode), mode)
+    out.insert(3, "label_meaning", out["label"].map(_LABEL_MEANINGS))
+    return out
+
+def _refresh_results(mode: str) -> None:
+    # Re-fuse cached raw signals only when the mode (or the data) changed.
+    if st.session_state.single_raw is not None and st.session_state.single_mode != mode:
+        row = _results_frame(st.session_state.single_raw, mode).iloc[0]
+        st.session_state.ba_last = {
+            "score": int(row["risk_score"]),
+            "label": row["label"],
+            "explanation": row["explanation"],
+        }
+        single_df = pd.DataFrame([{
+            "risk_score": int(row["risk_score"]),
+            "label": row["label"],
+            "label_meaning": row["label_meaning"],
+            "explanation": row["explanation"],
+        }])
+        st.session_state.single_csv = single_df.to_csv(index=False).encode("utf-8")
+        st.session_state.single_mode = mode
+
+    fmt = OUTPUT_FORMATS[st.session_state.batch_fmt]
+    if st.session_state.batch_raw_path is not None and st.session_state.batch_mode != (mode, fmt):
+        if st.session_state.batch_out_path and os.path.exists(st.session_state.batch_out_path):
+            os.remove(st.session_state.batch_out_path)
+        out_path = _new_temp_file("ecg_batch_out_", OUTPUT_EXTENSIONS[fmt])
+        top = TopK(TOP_K_PREVIEW)
+        with TableWriter(out_path, fmt) as w:
+            for raw in iter_raw_signals(st.session_state.batch_raw_path):
+                out = _results_frame(raw, mode)
+                w.write(out)
+                red = out[out["label"] == "RED"]
+                previews = raw.loc[red["row_idx"], "text_preview"].to_numpy()
+                for r, text in zip(red.itertuples(index=False), previews):
+                    top.push(r.risk_score, r.row_idx, {
+                        "row_idx": r.row_idx,
+                        "risk_score": r.risk_score,
+                        "explanation": r.explanation,
+                        "text": text,
+                    })
+        st.session_state.batch_out_path = out_path
+        st.session_state.batch_top = top.items()
+        st.session_state.batch_mode = (mode, fmt)
+
+def _new_temp_file(prefix: str, suffix: str = ".csv") -> str:
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+    os.close(fd)
+    return path
+
+def _persist_upload(up) -> str:
+    """Content-addressed copy of the upload that survives session restarts."""
+    data = up.getvalue()
+    ext = os.path.splitext(up.name)[1].lower()
+    path = os.path.join(BATCH_JOBS_DIR, "uploads", hashlib.sha1(data).hexdigest() + ext)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    # in use: refresh the marker, not the upload, to stay out of the age-based sweep
+    with open(path + ".inuse", "a"):
+        os.utime(path + ".inuse")
+    return path
+
+def _drop_batch_files() -> None:
+    for key in ("batch_raw_path", "batch_out_path"):
+        path = st.session_state.get(key)
+        if path and os.path.exists(path):
+            os.remove(path)
+        st.session_state[key] = None
+
 # -------------------- State --------------------
 if "ba_mode" not in st.session_state:
     st.session_state.ba_mode = "Balanced"
@@ -121,8 +206,22 @@ if "ba_last" not in st.session_state:
 if "single_csv" not in st.session_state:
     st.session_state.single_csv = None
 
-if "batch_csv" not in st.session_state:
-    st.session_state.batch_csv = None
+# mode-independent signals, re-fused whenever the sensitivity mode changes
+if "single_raw" not in st.session_state:
+    st.session_state.single_raw = None
+    st.session_state.single_mode = None
+
+# batch raw signals and fused results live in temp files, not in session memory
+if "batch_raw_path" not in st.session_state:
+    # once per session: drop uploads and abandoned jobs nobody has touched in a day
+    sweep_jobs_dir()
+    st.session_state.batch_raw_path = None
+    st.session_state.batch_out_path = None
+    st.session_state.batch_mode = None
+    st.session_state.batch_top = []
+
+if "batch_fmt" not in st.session_state:
+    st.session_state.batch_fmt = "CSV"
 
 # -------------------- Layout --------------------
 left, right = st.columns([2, 1], gap="large")
@@ -137,6 +236,7 @@ with right:
         ["Conservative", "Balanced", "Aggressive"],
         index=["Conservative", "Balanced", "Aggressive"].index(st.session_state.ba_mode),
     )
+    _refresh_results(st.session_state.ba_mode)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -184,30 +284,13 @@ with tab1:
     if clear_one:
         st.session_state.ba_last = None
         st.session_state.single_csv = None
+        st.session_state.single_raw = None
+        st.session_state.single_mode = None
         st.rerun()
 
     if run_one and reply_text.strip():
-        mp = float(predict_proba(reply_text))
-        th = _mode_threshold(load_threshold(), st.session_state.ba_mode)
-
-        a = assess("", reply_text, model_proba=mp, model_threshold=th)
-
-        label = _label_from_score(a.score)
-
-        st.session_state.ba_last = {
-            "score": int(a.score),
-            "label": label,
-            "explanation": a.explanation,
-        }
-
-        single_df = pd.DataFrame([{
-            "risk_score": int(a.score),
-            "label": label,
-            "label_meaning": _label_meaning(label),
-            "explanation": a.explanation,
-        }])
-
-        st.session_state.single_csv = single_df.to_csv(index=False).encode("utf-8")
+        st.session_state.single_raw = raw_signals([reply_text])
+        st.session_state.single_mode = None
 
         st.success("Analysis complete.")
         st.rerun()  # ✅ forces immediate refresh
@@ -229,52 +312,94 @@ with tab1:
     # =======================
     with tab2:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown('<div class="section-title">CSV batch analysis</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-title">Batch analysis (CSV, Parquet, Arrow)</div>', unsafe_allow_html=True)
 
-        up = st.file_uploader("Upload CSV", type=["csv"])
+        up = st.file_uploader("Upload file", type=["csv", "parquet", "pq", "arrow", "feather"])
 
         if up:
-            df = pd.read_csv(up)
-
-            text_col = st.selectbox("Text column", df.columns)
+            upload_path = _persist_upload(up)
+            columns = read_columns(upload_path)
+            approx_rows = count_rows(upload_path)
+            if approx_rows is None:
+                # approximate (quoted newlines count too); only used for progress/ETA
+                approx_rows = max(0, up.getvalue().count(b"\n") - 1)
+
+            text_col = st.selectbox("Text column", columns)
+
+            max_rows = st.number_input(
+                "Max rows (0 = all)", min_value=0, value=0, step=1000,
+                help=f"File has roughly {approx_rows:,} rows.",
+            )
 
-            max_rows = st.slider("Max rows", 10, min(2000, len(df)), min(300, len(df)))
+            near_dupes = st.checkbox(
+                "Collapse near-duplicates (MinHash)",
+                value=False,
+                help="Exact duplicates (ignoring case and whitespace) are always scored once.",
+            )
 
             run_batch = st.button("Run batch analysis", use_container_width=True)
 
             if run_batch:
-                texts = df.head(max_rows)[text_col].astype(str).tolist()
-                th = _mode_threshold(load_threshold(), st.session_state.ba_mode)
-
-                results = []
-                for i, t in enumerate(texts):
-                    mp = float(predict_proba(t))
-                    a = assess("", t, model_proba=mp, model_threshold=th)
-
-                    label = _label_from_score(a.score)
-
-                    results.append({
-                        "row_idx": i,
-                        "risk_score": int(a.score),
-                        "label": label,
-                        "label_meaning": _label_meaning(label),
-                        "explanation": a.explanation,
-                    })
-
-                out = pd.DataFrame(results).sort_values("risk_score", ascending=False)
-
-                st.session_state.batch_csv = out.to_csv(index=False).encode("utf-8")
-
-                st.success("Batch analysis complete.")
-
-        # ✅ CSV DOWNLOAD HERE
-        if st.session_state.batch_csv:
-            st.download_button(
-                "Download Batch Results (CSV)",
-                st.session_state.batch_csv,
-                "batch_risk_results.csv",
-                mime="text/csv",
-                use_container_width=True
+                _drop_batch_files()
+                limit = int(max_rows) or None
+                total = min(approx_rows, limit) if limit else approx_rows
+
+                # the job is keyed by upload content + options, so rerunning the
+                # same upload after a dropped session resumes from its last shard
+                job = BatchJob.for_file(
+                    upload_path, text_col, shard_rows=BATCH_SHARD_ROWS,
+                    limit=limit, near_dupes=near_dupes,
+                    input_key=(os.path.basename(upload_path), os.path.getsize(upload_path)),
+                )
+                resumed_rows = len(job.completed_shards()) * BATCH_SHARD_ROWS
+                if resumed_rows:
+                    st.info(f"Resuming: {len(job.completed_shards())} shard(s) already done.")
+
+                progress = st.progress(0.0, text="Starting...")
+                meter = Throughput(max(0, total - resumed_rows))
+
+                def _on_progress(done: int, scored_now: int) -> None:
+                    frac = min(1.0, done / total) if total else 0.0
+                    progress.progress(frac, text=meter.describe(scored_now))
+
+                n = job.run(on_progress=_on_progress)
+                progress.progress(1.0, text=f"{n:,} rows")
+
+                if n == 0:
+                    st.warning("No rows to analyze.")
+                else:
+                    st.session_state.batch_raw_path = job.merge(_new_temp_file("ecg_batch_raw_"))
+                    st.session_state.batch_mode = None
+                    _refresh_results(st.session_state.ba_mode)
+
+                    rows, unique = job.dedup_stats()
+                    ratio = 1.0 - unique / rows if rows else 0.0
+                    st.success(
+                        f"Batch analysis complete: {n:,} rows, {unique:,} scored "
+                        f"({ratio:.0%} deduplicated)."
+                    )
+                # merged into the session's temp file; the checkpoints are no longer needed
+                job.cleanup()
+
+        if st.session_state.batch_top:
+            st.markdown(
+                f'<div class="section-title">Top {TOP_K_PREVIEW} RED rows</div>',
+                unsafe_allow_html=True,
             )
-
-        st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+            st.dataframe(pd.DataFrame(st.session_state.batch_top), use_container_width=True, height=240)
+
+        st.selectbox("Results format", list(OUTPUT_FORMATS), key="batch_fmt")
+
+        # ✅ RESULTS DOWNLOAD HERE
+        if st.session_state.batch_out_path:
+            fmt = detect_format(st.session_state.batch_out_path)
+            with open(st.session_state.batch_out_path, "rb") as f:
+                st.download_button(
+                    f"Download Batch Results ({st.session_state.batch_fmt})",
+                    f,
+                    "batch_risk_results" + OUTPUT_EXTENSIONS[fmt],
+                    mime=MIME_TYPES[fmt],
+                    use_container_width=True
+                )
+
+        st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,197 @@
+import io
+import os
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+OUTPUT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Output column types; anything not listed is inferred by Arrow.
+COLUMN_TYPES: dict[str, pa.DataType] = {
+    "row_idx": pa.uint64(),
+    "turn_id": pa.uint32(),
+    "risk_score": pa.uint8(),
+    "model_proba": pa.float32(),
+    "model_score": pa.float32(),
+    "rule_score": pa.float32(),
+    "context_score": pa.float32(),
+    "prompt_cue": pa.bool_(),
+    "label": pa.dictionary(pa.int32(), pa.string()),
+    "label_meaning": pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def detect_format(path_or_name: str) -> str:
+    ext = os.path.splitext(path_or_name)[1].lower()
+    if ext not in FORMAT_EXTENSIONS:
+        raise ValueError(f"unsupported file type: {ext or path_or_name}")
+    return FORMAT_EXTENSIONS[ext]
+
+
+def _open_arrow(path: str) -> pa_ipc.RecordBatchFileReader:
+    # memory-mapped: record batches reference the file pages, no copy
+    return pa_ipc.open_file(pa.memory_map(path, "r"))
+
+
+def read_columns(path: str) -> list[str]:
+    fmt = detect_format(path)
+    if fmt == "parquet":
+        return list(pq.read_schema(path).names)
+    if fmt == "arrow":
+        return list(_open_arrow(path).schema.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def count_rows(path: str) -> int | None:
+    """Exact row count from metadata for Parquet/Arrow; None for CSV."""
+    fmt = detect_format(path)
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "arrow":
+        reader = _open_arrow(path)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return None
+
+
+def iter_column_chunks(path: str, columns: list[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Frames of `chunksize` rows holding only `columns`. Parquet and Arrow inputs
+    are read as record batches of just those columns; others are never loaded.
+    """
+    fmt = detect_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+
+    if fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        reader = _open_arrow(path)
+        idx = [reader.schema.get_field_index(c) for c in columns]
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        batches = (pa.record_batch([b.column(j) for j in idx], names=columns) for b in batches)
+
+    # re-slice so shard boundaries depend only on chunksize, not file layout
+    pending: list[pa.RecordBatch] = []
+    n_pending = 0
+    for b in batches:
+        pending.append(b)
+        n_pending += b.num_rows
+        while n_pending >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunksize).to_pandas()
+            rest = table.slice(chunksize)
+            pending = rest.to_batches()
+            n_pending = rest.num_rows
+    if n_pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def iter_text_chunks(path: str, text_col: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Single-column frames of `chunksize` rows."""
+    return iter_column_chunks(path, [text_col], chunksize)
+
+
+class _Categories:
+    """Growing value->code map so every batch shares one (append-only) dictionary."""
+
+    def __init__(self):
+        self.values: list[str] = []
+        self.codes: dict[str, int] = {}
+
+    def encode(self, values: pd.Series, type_: pa.DictionaryType) -> pa.DictionaryArray:
+        idx = []
+        for v in values.astype(str):
+            code = self.codes.get(v)
+            if code is None:
+                code = self.codes[v] = len(self.values)
+                self.values.append(v)
+            idx.append(code)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(idx, type=type_.index_type), pa.array(self.values, type=type_.value_type)
+        )
+
+
+def typed_table(df: pd.DataFrame, categories: dict[str, _Categories] | None = None) -> pa.Table:
+    """Arrow table with compact column types (uint8 scores, float32 probabilities, categorical labels)."""
+    categories = {} if categories is None else categories
+    arrays = {}
+    for c in df.columns:
+        t = COLUMN_TYPES.get(c)
+        if t is None:
+            arrays[c] = pa.array(df[c], from_pandas=True)
+        elif pa.types.is_dictionary(t):
+            arrays[c] = categories.setdefault(c, _Categories()).encode(df[c], t)
+        else:
+            arrays[c] = pa.array(df[c], type=t, from_pandas=True)
+    return pa.table(arrays)
+
+
+class TableWriter:
+    """Append-only writer for CSV, Parquet or Arrow IPC output, one frame at a time."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._writer = None
+        self._schema = None
+        self._categories: dict[str, _Categories] = {}
+        self._wrote_header = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w", header=not self._wrote_header, index=False)
+            self._wrote_header = True
+            return
+
+        table = typed_table(df, self._categories)
+        if self._writer is None:
+            self._schema = table.schema
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                opts = pa_ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                self._writer = pa_ipc.new_file(self.path, table.schema, options=opts)
+        else:
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def to_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    sink = io.BytesIO()
+    table = typed_table(df)
+    if fmt == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa_ipc.new_file(sink, table.schema) as w:
+            w.write_table(table)
+    return sink.getvalue()
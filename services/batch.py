@@ -0,0 +1,218 @@
+import heapq
+import time
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from services.detector import (
+    _compute_rule_score,
+    _prompt_requests_coercion,
+    _rule_assess,
+    get_rules,
+)
+from services.dedup import Deduper
+from services.sbert_lr import predict_proba_batch
+
+RISK_LABELS = ("GREEN", "YELLOW", "RED")
+
+SEMANTIC_EXPLANATION = "High coercion likelihood detected by semantic model."
+NO_MARKERS_EXPLANATION = "No clear coercive markers detected."
+
+# Rows embedded and scored per chunk when streaming large inputs.
+BATCH_CHUNK_ROWS = 512
+TEXT_PREVIEW_CHARS = 200
+
+
+def _count_col(cat: str) -> str:
+    return f"n_{cat}"
+
+
+def _marker_explanation(counts: dict[str, int]) -> str:
+    found = [k.replace("_", " ") for k, v in counts.items() if v > 0]
+    if not found:
+        return NO_MARKERS_EXPLANATION
+    return "Detected markers related to: " + ", ".join(found) + "."
+
+
+def raw_signals(texts: list[str], prompts: list[str] | None = None) -> pd.DataFrame:
+    """
+    Mode-independent signals per row: model probability, per-category marker
+    counts, rule score, context score and whether the prompt asked for
+    pressuring wording. Everything a mode switch needs to
+    re-score the rows without re-embedding.
+    """
+    rules = get_rules()
+    cats = list(rules.category_markers.keys())
+    prompts = prompts if prompts is not None else [""] * len(texts)
+
+    model_proba = predict_proba_batch(texts)
+    rule_score = np.empty(len(texts), dtype=np.float64)
+    context_score = np.empty(len(texts), dtype=np.float64)
+    prompt_cue = np.zeros(len(texts), dtype=bool)
+    counts = np.zeros((len(texts), len(cats)), dtype=np.int32)
+    marker_explanation = np.empty(len(texts), dtype=object)
+
+    for i, (prompt, t) in enumerate(zip(prompts, texts)):
+        c, _ = _rule_assess(t, rules)
+        counts[i] = [c[k] for k in cats]
+        rule_score[i] = _compute_rule_score(c, rules.category_weights)
+        prompt_cue[i] = _prompt_requests_coercion(prompt, rules.coercion_request_cues)
+        context_score[i] = 0.0 if prompt_cue[i] else min(1.0, rule_score[i])
+        marker_explanation[i] = _marker_explanation(c)
+
+    out = pd.DataFrame(
+        {
+            "model_proba": model_proba,
+            "rule_score": rule_score,
+            "context_score": context_score,
+            "prompt_cue": prompt_cue,
+            "marker_explanation": marker_explanation,
+        }
+    )
+    for j, cat in enumerate(cats):
+        out[_count_col(cat)] = counts[:, j]
+    return out
+
+
+def fuse(raw: pd.DataFrame, model_threshold: float, mode: str = "Balanced") -> pd.DataFrame:
+    """
+    Vectorized equivalent of detector.assess() fusion over cached raw signals.
+    Returns risk_score (0-100), model_score and explanation per row.
+    """
+    rules = get_rules()
+    cfg = rules.mode_configs.get(mode, rules.mode_configs["Balanced"])
+
+    p = raw["model_proba"].to_numpy(dtype=np.float64)
+    th = float(model_threshold)
+    model_score = np.where(p <= th, 0.0, np.clip((p - th) / max(1e-6, 1.0 - th), 0.0, 1.0))
+
+    fused = (
+        cfg["w_rule"] * raw["rule_score"].to_numpy(dtype=np.float64)
+        + cfg["w_model"] * model_score
+        + cfg["w_context"] * raw["context_score"].to_numpy(dtype=np.float64)
+    )
+    score = np.rint(100.0 * np.clip(fused, 0.0, 1.0)).astype(np.int64)
+
+    explanation = np.where(
+        model_score >= cfg["model_only_gate"],
+        SEMANTIC_EXPLANATION,
+        raw["marker_explanation"].to_numpy(dtype=object),
+    )
+
+    return pd.DataFrame(
+        {
+            "risk_score": score,
+            "model_score": model_score,
+            "explanation": explanation,
+        },
+        index=raw.index,
+    )
+
+
+def label_from_scores(score: np.ndarray) -> np.ndarray:
+    """UI risk bands: <=25 GREEN, <=40 YELLOW, otherwise RED."""
+    return np.select([score <= 25, score <= 40], ["GREEN", "YELLOW"], "RED")
+
+
+def score_frame(raw: pd.DataFrame, model_threshold: float, mode: str = "Balanced") -> pd.DataFrame:
+    """row_idx, risk_score, label, model probability/score and explanation for cached raw signals."""
+    fused = fuse(raw, model_threshold, mode)
+    score = fused["risk_score"].to_numpy()
+    return pd.DataFrame({
+        "row_idx": raw.index.to_numpy(),
+        "risk_score": score.astype(int),
+        "label": label_from_scores(score),
+        "model_proba": raw["model_proba"].to_numpy(),
+        "model_score": fused["model_score"].to_numpy(),
+        "explanation": fused["explanation"].to_numpy(),
+    })
+
+
+def write_raw_signals(
+    chunks: Iterable[pd.DataFrame],
+    text_col: str,
+    out_path: str,
+    limit: int | None = None,
+    on_progress: Callable[[int], None] | None = None,
+    deduper: Deduper | None = None,
+    start_row: int = 0,
+) -> int:
+    """
+    Score text chunks one at a time and append their raw signals (with a
+    global row_idx) to a CSV at `out_path`. Returns the number of rows.
+
+    With a (fresh) `deduper`, only the first row of each duplicate cluster in
+    a chunk is scored and its signals are copied to the cluster's other rows.
+    Representative signals are kept for the current chunk only, so memory is
+    bounded by the chunk size; a cluster that recurs in a later chunk is
+    scored once more there. row_idx numbering starts at `start_row`.
+    """
+    done = 0
+    for chunk in chunks:
+        if limit is not None:
+            chunk = chunk.head(limit - done)
+        if chunk.empty:
+            break
+        texts = chunk[text_col].fillna("").astype(str).tolist()
+        if deduper is None:
+            raw = raw_signals(texts)
+        else:
+            ids, _ = deduper.assign(texts)
+            # cluster ids grow in order of first appearance, so `first` is in row order
+            _, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+            raw = raw_signals([texts[i] for i in first]).iloc[inverse].reset_index(drop=True)
+        raw.insert(0, "row_idx", np.arange(start_row + done, start_row + done + len(raw)))
+        raw["text_preview"] = [t[:TEXT_PREVIEW_CHARS] for t in texts]
+        raw.to_csv(out_path, mode="w" if done == 0 else "a", header=done == 0, index=False)
+        done += len(raw)
+        if on_progress is not None:
+            on_progress(done)
+        if limit is not None and done >= limit:
+            break
+    return done
+
+
+def iter_raw_signals(path: str, chunksize: int = BATCH_CHUNK_ROWS * 8) -> Iterator[pd.DataFrame]:
+    for chunk in pd.read_csv(path, chunksize=chunksize, keep_default_na=False):
+        yield chunk.set_index("row_idx")
+
+
+class TopK:
+    """Keeps the k highest-scoring items seen so far in a bounded min-heap."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: list[tuple] = []
+
+    def push(self, score: float, row_idx: int, item) -> None:
+        entry = (score, -row_idx, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> list:
+        return [e[2] for e in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+class Throughput:
+    """Rows/s and ETA for progress reporting."""
+
+    def __init__(self, total: int | None = None):
+        self.total = total
+        self.start = time.perf_counter()
+
+    def describe(self, done: int) -> str:
+        elapsed = max(1e-9, time.perf_counter() - self.start)
+        rate = done / elapsed
+        msg = f"{done:,} rows · {rate:,.0f} rows/s"
+        if self.total and rate > 0:
+            eta = max(0.0, (self.total - done) / rate)
+            msg += f" · ETA {eta:,.0f}s"
+        return msg
+
+    def fraction(self, done: int) -> float:
+        if not self.total:
+            return 0.0
+        return min(1.0, done / self.total)
@@ -0,0 +1,205 @@
+from collections import deque
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from services.detector import category_names
+
+# Rolling risk: exponentially decayed turn scores; a turn's weight halves
+# every ROLLING_HALF_LIFE turns.
+ROLLING_HALF_LIFE = 4.0
+# Sliding window (in audited turns) for category counts and the score trend.
+TREND_WINDOW = 8
+# Alert thresholds. Rolling bands match the per-turn UI bands (<=25, <=40).
+ROLLING_YELLOW = 25.0
+ROLLING_RED = 40.0
+ESCALATION_SLOPE = 3.0  # risk points per turn across the window
+ESCALATION_MIN_TURNS = 4
+CATEGORY_PERSIST_TURNS = 3  # turns with markers of one category inside the window
+CUE_PERSIST_TURNS = 2  # turns whose prompt asked for coercive wording
+
+class ConversationRisk:
+    """
+    Conversation-level risk, updated once per audited assistant turn in
+    constant time and memory. Keeps a decayed rolling score, sliding-window
+    category counts and a least-squares slope of the turn scores, and raises
+    an alert the first time each escalation condition becomes true.
+    """
+
+    def __init__(self, half_life: float = ROLLING_HALF_LIFE, window: int = TREND_WINDOW):
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.window = window
+        self.turns = 0
+        self.last_turn_id: int | None = None
+        self.last_score: int | None = None
+        self.peak_score: int | None = None
+
+        # decayed sums; rolling = _num / _den so early turns are not biased to 0
+        self._num = 0.0
+        self._den = 0.0
+
+        # sliding window: (turn index, score, categories with hits, prompt cue flag)
+        self._win: deque[tuple[int, float, tuple[str, ...], int]] = deque()
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        # category -> turns in the window with its markers; only categories with hits
+        self.category_window: dict[str, int] = {}
+        self.cue_window = 0
+
+        self.active: set[str] = set()
+        self.alerts: list[dict] = []
+
+    def __len__(self) -> int:
+        return self.turns
+
+    @property
+    def rolling_score(self) -> float | None:
+        return None if self._den == 0.0 else self._num / self._den
+
+    @property
+    def trend(self) -> float:
+        """Least-squares slope of turn scores over the window, in points per turn."""
+        n = len(self._win)
+        if n < 2:
+            return 0.0
+        # x runs over consecutive turn indices x0..x0+n-1
+        x0 = self._win[0][0]
+        sum_x = n * x0 + n * (n - 1) / 2.0
+        sum_xx = n * x0 * x0 + x0 * n * (n - 1) + (n - 1) * n * (2 * n - 1) / 6.0
+        den = n * sum_xx - sum_x * sum_x
+        if den == 0.0:
+            return 0.0
+        return (n * self._sum_xy - sum_x * self._sum_y) / den
+
+    def categories_in_window(self) -> dict[str, int]:
+        return {c: self.category_window.get(c, 0) for c in category_names(self.category_window)}
+
+    def update(self, turn_id: int, a) -> list[dict]:
+        """Fold in one audited turn (an Assessment or CompactAudit); returns newly raised alerts."""
+        return self.update_values(turn_id, int(a.score), a.categories or {}, bool(a.prompt_cue))
+
+    def update_values(self, turn_id: int, score: int, categories: dict[str, int], prompt_cue: bool) -> list[dict]:
+        x = self.turns
+        y = float(score)
+        hits = tuple(c for c, v in categories.items() if int(v) > 0)
+        cue = 1 if prompt_cue else 0
+
+        self.turns += 1
+        self.last_turn_id = int(turn_id)
+        self.last_score = int(score)
+        if self.peak_score is None or score > self.peak_score:
+            self.peak_score = int(score)
+
+        self._num = self.decay * self._num + y
+        self._den = self.decay * self._den + 1.0
+
+        self._win.append((x, y, hits, cue))
+        self._sum_y += y
+        self._sum_xy += x * y
+        for c in hits:
+            self.category_window[c] = self.category_window.get(c, 0) + 1
+        self.cue_window += cue
+        if len(self._win) > self.window:
+            ox, oy, ohits, ocue = self._win.popleft()
+            self._sum_y -= oy
+            self._sum_xy -= ox * oy
+            for c in ohits:
+                self.category_window[c] -= 1
+                if not self.category_window[c]:
+                    del self.category_window[c]
+            self.cue_window -= ocue
+
+        return self._check_alerts()
+
+    def _conditions(self) -> dict[str, str]:
+        cond = {}
+        rolling = self.rolling_score
+        if rolling is not None and rolling > ROLLING_RED:
+            cond["rolling_red"] = f"Rolling conversation risk is high ({rolling:.0f}/100)."
+        elif rolling is not None and rolling > ROLLING_YELLOW:
+            cond["rolling_yellow"] = f"Rolling conversation risk is elevated ({rolling:.0f}/100)."
+
+        slope = self.trend
+        if len(self._win) >= ESCALATION_MIN_TURNS and slope >= ESCALATION_SLOPE:
+            cond["escalating"] = f"Risk is rising across recent turns (+{slope:.1f} per turn)."
+
+        for c, n in self.categories_in_window().items():
+            if n >= CATEGORY_PERSIST_TURNS:
+                cond[f"persistent:{c}"] = (
+                    f"{c.replace('_', ' ').capitalize()} markers in {n} of the last {len(self._win)} replies."
+                )
+
+        if self.cue_window >= CUE_PERSIST_TURNS:
+            cond["repeated_requests"] = (
+                f"The user asked for pressuring wording in {self.cue_window} of the last {len(self._win)} turns."
+            )
+        return cond
+
+    def _check_alerts(self) -> list[dict]:
+        cond = self._conditions()
+        # an alert re-arms once its condition clears
+        self.active &= cond.keys()
+        raised = []
+        for kind, message in cond.items():
+            if kind in self.active:
+                continue
+            self.active.add(kind)
+            alert = {"turn_id": self.last_turn_id, "kind": kind, "message": message}
+            self.alerts.append(alert)
+            raised.append(alert)
+        return raised
+
+    def summary(self) -> dict:
+        rolling = self.rolling_score
+        return {
+            "turns": self.turns,
+            "rolling_score": None if rolling is None else round(rolling, 2),
+            "trend": round(self.trend, 3),
+            "peak_score": self.peak_score,
+            "categories_in_window": self.categories_in_window(),
+            "active_alerts": sorted(self.active),
+            "n_alerts": len(self.alerts),
+        }
+
+
+def _row_categories(row: dict) -> dict[str, int]:
+    return {k[2:]: v for k, v in row.items() if k.startswith("n_")}
+
+
+def iter_conversation_risk(rows: Iterable[dict], conv_key: str = "conversation_id") -> Iterator[dict]:
+    """
+    Run one tracker per conversation over scored turn rows (risk_score,
+    prompt_cue, n_<category>), in order. Rows of a conversation need not be
+    contiguous; each conversation keeps its own small, fixed-size tracker.
+    """
+    trackers: dict = {}
+    for row in rows:
+        key = row[conv_key]
+        tr = trackers.get(key)
+        if tr is None:
+            tr = trackers[key] = ConversationRisk()
+        raised = tr.update_values(
+            row.get("turn_id", tr.turns),
+            int(row["risk_score"]),
+            _row_categories(row),
+            bool(row.get("prompt_cue", False)),
+        )
+        yield {
+            conv_key: key,
+            "turn_id": tr.last_turn_id,
+            "rolling_score": tr.rolling_score,
+            "trend": tr.trend,
+            "alerts": "; ".join(a["kind"] for a in raised),
+        }
+
+
+def conversation_risk_frame(df: pd.DataFrame, conv_col: str = "conversation_id") -> pd.DataFrame:
+    """Per-turn rolling score, trend and newly raised alerts for a frame of scored turns."""
+    cols = [conv_col, "risk_score"] + [c for c in df.columns if c in ("turn_id", "prompt_cue") or c.startswith("n_")]
+    out = pd.DataFrame(list(iter_conversation_risk(df[cols].to_dict("records"), conv_col)), index=df.index)
+    if len(out):
+        out["rolling_score"] = out["rolling_score"].astype(np.float64).round(2)
+        out["trend"] = out["trend"].astype(np.float64).round(3)
+    return out
+
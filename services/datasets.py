@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+from sklearn.model_selection import train_test_split
+
+from services.arrow_io import iter_column_chunks
+from services.dedup import Deduper
+from services.jobs import _atomic_write_text, file_fingerprint, job_id
+from services.sbert_lr import EMBEDDER_NAME, embed
+from utils.config import DATASETS_DIR
+
+SEED = 42
+VAL_FRACTION = 0.2
+# Rows per CSV chunk during conversion, and per embedder call when streaming text.
+CONVERT_CHUNK_ROWS = 10_000
+TEXT_BATCH_ROWS = 1024
+# Part of the dataset key; bump when conversion output changes (e.g. the duplicate key).
+DATASET_VERSION = 2
+
+# rep_row: first row with the same (normalized) text; only those rows are embedded.
+SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("label", pa.int8()),
+    ("rep_row", pa.uint32()),
+])
+
+
+def build_dataset(
+    csv: str,
+    text_col: str,
+    label_col: str,
+    out_dir: str,
+    val_fraction: float = VAL_FRACTION,
+    seed: int = SEED,
+    chunksize: int = CONVERT_CHUNK_ROWS,
+) -> str:
+    """
+    Stream a labelled CSV (or Parquet/Arrow file) into `out_dir`: an Arrow IPC
+    file of text, int8 label and duplicate representative, stratified
+    train/val indices, and meta.json, which is written last.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    data_path = os.path.join(out_dir, "data.arrow")
+    tmp = data_path + f".{os.getpid()}.tmp"
+    deduper = Deduper()
+    first_rows = np.empty(0, dtype=np.uint32)
+    labels: list[np.ndarray] = []
+    n = 0
+    with pa.OSFile(tmp, "wb") as sink, pa_ipc.new_file(sink, SCHEMA) as writer:
+        for chunk in iter_column_chunks(csv, [text_col, label_col], chunksize):
+            chunk = chunk.dropna()
+            if chunk.empty:
+                continue
+            texts = chunk[text_col].astype(str).tolist()
+            y = chunk[label_col].astype(np.int8).to_numpy()
+            ids, is_new = deduper.assign(texts)
+            first_rows = np.concatenate([first_rows, (n + np.flatnonzero(is_new)).astype(np.uint32)])
+            writer.write_batch(pa.record_batch([
+                pa.array(texts, pa.string()),
+                pa.array(y, pa.int8()),
+                pa.array(first_rows[ids], pa.uint32()),
+            ], schema=SCHEMA))
+            labels.append(y)
+            n += len(texts)
+    if n == 0:
+        os.remove(tmp)
+        raise ValueError(f"no labelled rows in {csv}")
+    os.replace(tmp, data_path)
+
+    # same split train_test_split gives on the dropna'd frame; stored sorted for sequential reads
+    y = np.concatenate(labels)
+    train, val = train_test_split(np.arange(n), test_size=val_fraction, random_state=seed, stratify=y)
+    np.savez(os.path.join(out_dir, "splits.npz"), train=np.sort(train), val=np.sort(val))
+
+    values, counts = np.unique(y, return_counts=True)
+    meta = {
+        "source": os.path.abspath(csv),
+        "text_col": text_col,
+        "label_col": label_col,
+        "rows": n,
+        "unique_texts": int(deduper.n_clusters),
+        "label_counts": {str(int(v)): int(c) for v, c in zip(values, counts)},
+        "val_fraction": val_fraction,
+        "seed": seed,
+    }
+    _atomic_write_text(os.path.join(out_dir, "meta.json"), json.dumps(meta, indent=2))
+    return out_dir
+
+
+class LabelledDataset:
+    """
+    A converted dataset, memory-mapped: text is read from the Arrow file's
+    pages on demand, so opening it costs no parsing and little RAM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.table = pa_ipc.open_file(pa.memory_map(os.path.join(path, "data.arrow"), "r")).read_all()
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.table.column("label").to_numpy()
+
+    @property
+    def rep_rows(self) -> np.ndarray:
+        return self.table.column("rep_row").to_numpy()
+
+    def split(self, name: str) -> np.ndarray:
+        """Row indices of the stored "train" or "val" split, ascending."""
+        with np.load(os.path.join(self.path, "splits.npz")) as z:
+            return z[name]
+
+    def iter_text_batches(
+        self, indices: np.ndarray | None = None, batch_size: int = TEXT_BATCH_ROWS
+    ) -> Iterator[tuple[np.ndarray, list[str]]]:
+        """(row indices, texts) batches; only one batch of Python strings exists at a time."""
+        col = self.table.column("text")
+        if indices is None:
+            for start in range(0, len(self), batch_size):
+                stop = min(len(self), start + batch_size)
+                yield np.arange(start, stop), col.slice(start, stop - start).to_pylist()
+            return
+        for start in range(0, len(indices), batch_size):
+            idx = np.asarray(indices[start:start + batch_size])
+            yield idx, col.take(pa.array(idx)).to_pylist()
+
+    def texts(self, indices: np.ndarray | None = None) -> list[str]:
+        return [t for _, batch in self.iter_text_batches(indices) for t in batch]
+
+    def embeddings(self, name: str = EMBEDDER_NAME, batch_size: int = TEXT_BATCH_ROWS) -> np.ndarray:
+        """
+        Every row's embedding as a read-only memory map, computed once per
+        embedder and stored next to the data. Distinct texts are embedded in
+        streamed batches straight into the .npy; duplicates are copied from
+        their representative row. A static (.npz) embedder is keyed by its
+        file identity too, so re-distilling it invalidates the cache.
+        """
+        ident = repr(file_fingerprint(name)) if name.endswith(".npz") else name
+        key = hashlib.blake2b(ident.encode("utf-8"), digest_size=8).hexdigest()
+        path = os.path.join(self.path, f"embeddings_{key}.npy")
+        if not os.path.exists(path):
+            rep = self.rep_rows
+            rows = np.arange(len(self), dtype=rep.dtype)
+            tmp = path + f".{os.getpid()}.tmp.npy"
+            X = None
+            for idx, batch in self.iter_text_batches(np.flatnonzero(rep == rows), batch_size):
+                E = np.asarray(embed(batch, name=name), dtype=np.float32)
+                if X is None:
+                    X = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(self), E.shape[1]))
+                X[idx] = E
+            dups = np.flatnonzero(rep != rows)
+            for start in range(0, len(dups), batch_size):
+                d = dups[start:start + batch_size]
+                X[d] = X[rep[d]]
+            X.flush()
+            del X
+            os.replace(tmp, path)
+        return np.load(path, mmap_mode="r")
+
+
+def dataset_for(
+    csv: str,
+    text_col: str = "assistant_reply",
+    label_col: str = "label",
+    val_fraction: float = VAL_FRACTION,
+    seed: int = SEED,
+    datasets_dir: str = DATASETS_DIR,
+) -> LabelledDataset:
+    """The converted dataset for this file and options, converting it on first use."""
+    key = job_id(DATASET_VERSION, file_fingerprint(csv), text_col, label_col, val_fraction, seed)
+    path = os.path.join(datasets_dir, key)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        build_dataset(csv, text_col, label_col, path, val_fraction, seed)
+    return LabelledDataset(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a labelled CSV into a memory-mapped Arrow dataset.")
+    ap.add_argument("--csv", default="data/hh_coercion_weak_labels.csv")
+    ap.add_argument("--text_col", default="assistant_reply")
+    ap.add_argument("--label_col", default="label")
+    ap.add_argument("--val_fraction", type=float, default=VAL_FRACTION)
+    ap.add_argument("--embed", action="store_true", help="also precompute full-model embeddings")
+    args = ap.parse_args()
+
+    ds = dataset_for(args.csv, args.text_col, args.label_col, args.val_fraction)
+    if args.embed:
+        ds.embeddings()
+    print(json.dumps(ds.meta, indent=2))
+    print("Dataset:", ds.path)
+
+if __name__ == "__main__":
+    main()
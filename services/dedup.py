@@ -0,0 +1,122 @@
+import hashlib
+import zlib
+
+import numpy as np
+
+from services.detector import normalize_text as detector_normalize
+
+SEED = 42
+
+# MinHash/LSH defaults: 8 bands x 8 rows puts the 50% collision point
+# at roughly 0.77 Jaccard similarity over word 3-gram shingles.
+NUM_PERM = 64
+LSH_BANDS = 8
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 31) - 1
+
+
+def normalize_text(text: str) -> str:
+    """
+    The detector's normalization (typographic folding, casefold) with
+    whitespace runs collapsed. Rows with the same key get the same rule
+    counts, so a representative's signals hold for its whole cluster.
+    """
+    return " ".join(detector_normalize(text or "")[0].split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+
+def _shingle_hashes(norm: str) -> np.ndarray:
+    words = norm.split(" ")
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {norm}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles), dtype=np.uint64)
+
+
+class Deduper:
+    """
+    Assigns rows to duplicate clusters so only one representative per cluster
+    needs scoring. Exact duplicates are matched on a hash of the normalized
+    text; with near=True, MinHash/LSH also merges near-identical rows.
+    State persists across calls, so a stream of chunks is deduplicated globally.
+    """
+
+    def __init__(self, near: bool = False, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.near = near
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = np.random.default_rng(SEED)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._exact: dict[bytes, int] = {}
+        self._buckets: dict[tuple[int, bytes], int] = {}
+        self.n_rows = 0
+        self.n_clusters = 0
+
+    @property
+    def ratio(self) -> float:
+        """Fraction of rows that did not need scoring (0.0 = no duplicates)."""
+        if self.n_rows == 0:
+            return 0.0
+        return 1.0 - self.n_clusters / self.n_rows
+
+    def _signature(self, norm: str) -> np.ndarray:
+        x = _shingle_hashes(norm)
+        return ((self._a[:, None] * x[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, sig: np.ndarray) -> list[tuple[int, bytes]]:
+        r = self.rows_per_band
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def assign(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (cluster_ids, is_new): the cluster of every row, and a mask of
+        rows that opened a new cluster and therefore must be scored.
+        """
+        ids = np.empty(len(texts), dtype=np.int64)
+        is_new = np.zeros(len(texts), dtype=bool)
+
+        for i, t in enumerate(texts):
+            key = text_key(t)
+            cid = self._exact.get(key)
+
+            band_keys = None
+            norm = normalize_text(t) if cid is None and self.near else ""
+            if norm:
+                band_keys = self._band_keys(self._signature(norm))
+                for bk in band_keys:
+                    cid = self._buckets.get(bk)
+                    if cid is not None:
+                        break
+
+            if cid is None:
+                cid = self.n_clusters
+                self.n_clusters += 1
+                is_new[i] = True
+                if band_keys is not None:
+                    for bk in band_keys:
+                        self._buckets.setdefault(bk, cid)
+
+            self._exact.setdefault(key, cid)
+            ids[i] = cid
+
+        self.n_rows += len(texts)
+        return ids, is_new
+
+
+def unique_with_inverse(texts: list[str], near: bool = False) -> tuple[list[int], np.ndarray, Deduper]:
+    """
+    One-shot helper: indices of representative rows plus the inverse map,
+    so `values[inverse]` broadcasts per-representative results to every row.
+    """
+    d = Deduper(near=near)
+    ids, is_new = d.assign(texts)
+    reps = np.flatnonzero(is_new).tolist()
+    return reps, ids, d
@@ -1,6 +1,14 @@
+import logging
+import os
 import re
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Iterable
+
+from utils.config import ConfigFileError, load_json_cached
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_CONFIG_PATH = os.path.join("models", "detector_config.json")
 
 CATEGORY_WEIGHTS: dict[str, float] = {
     "urgency": 1.0,
@@ -125,24 +133,128 @@ class Assessment:
     rule_score: float
     model_score: float | None
     context_score: float
+    # the prompt asked for pressuring wording (context_score is 0.0 then)
+    prompt_cue: bool
     fusion_weights: dict[str, float]
     mode: str
     model_threshold: float
 
+# Replies and lexicon are folded the same way before matching: typographic
+# apostrophes and quotes to ASCII, every whitespace character to a space,
+# invisible characters dropped, then casefold. Replacements are 1:1, so text
+# without invisible characters or expanding casefolds (ß -> ss) keeps its offsets.
+_APOSTROPHES = "\u2018\u2019\u201a\u201b\u02bc\u2032\u00b4`"
+_QUOTES = "\u201c\u201d\u201e\u201f\u2033\u00ab\u00bb"
+_INVISIBLE = "\u00ad\u200b\u200c\u200d\u2060\ufeff"
+_FOLD_TABLE: dict[int, str | None] = {
+    **{i: " " for i in range(0x3001) if chr(i).isspace()},
+    **{ord(c): "'" for c in _APOSTROPHES},
+    **{ord(c): '"' for c in _QUOTES},
+    **{ord(c): None for c in _INVISIBLE},
+}
+
+def normalize_text(text: str) -> tuple[str, list[int] | None]:
+    """
+    Folded text plus, when offsets moved, the index into `text` of every
+    folded character (None means offsets are unchanged).
+    """
+    folded = text.translate(_FOLD_TABLE)
+    if len(folded) == len(text):
+        norm = folded.casefold()
+        # casefold never shortens a character, so equal length means 1:1
+        if len(norm) == len(text):
+            return norm, None
+    out: list[str] = []
+    src: list[int] = []
+    for i, ch in enumerate(text):
+        f = ch.translate(_FOLD_TABLE).casefold()
+        out.append(f)
+        src.extend([i] * len(f))
+    return "".join(out), src
+
+def _normalize_phrase(phrase: str) -> str:
+    return " ".join(normalize_text(phrase or "")[0].split())
+
 def _phrase_regex(phrase: str) -> re.Pattern:
-    p = (phrase or "").strip()
-    escaped = re.escape(p)
-    if re.search(r"\s", p):
-        return re.compile(rf"(?<!\w){escaped}(?!\w)", re.IGNORECASE)
-    return re.compile(rf"\b{escaped}\b", re.IGNORECASE)
-
-def _find_spans(text: str, phrase: str) -> list[tuple[int, int]]:
-    spans: list[tuple[int, int]] = []
-    t = text or ""
-    pat = _phrase_regex(phrase)
-    for m in pat.finditer(t):
-        spans.append((m.start(), m.end()))
-    return spans
+    words = _normalize_phrase(phrase).split(" ")
+    escaped = " +".join(re.escape(w) for w in words)
+    if len(words) > 1:
+        return re.compile(rf"(?<!\w){escaped}(?!\w)")
+    return re.compile(rf"\b{escaped}\b")
+
+@dataclass(frozen=True)
+class DetectorRules:
+    version: str
+    category_weights: dict[str, float]
+    category_markers: dict[str, list[str]]
+    mode_configs: dict[str, dict[str, float]]
+    coercion_request_cues: list[str]
+    # (category, compiled phrase pattern, longest word), longest phrases first;
+    # the word is a substring pre-check on the folded text before the regex runs
+    phrase_bank: tuple[tuple[str, re.Pattern, str], ...]
+
+def build_rules(overrides: dict | None = None) -> DetectorRules:
+    o = overrides or {}
+    weights = {**CATEGORY_WEIGHTS, **o.get("category_weights", {})}
+    markers = {**CATEGORY_MARKERS, **o.get("category_markers", {})}
+    modes = {k: dict(v) for k, v in MODE_CONFIGS.items()}
+    for name, cfg in o.get("mode_configs", {}).items():
+        modes[name] = {**modes.get(name, MODE_CONFIGS["Balanced"]), **cfg}
+    cues = list(o.get("coercion_request_cues", COERCION_REQUEST_CUES))
+
+    # typographic variants of one phrase fold together and count once
+    bank: list[tuple[str, str]] = []
+    seen: set[tuple[str, str]] = set()
+    for cat, phrases in markers.items():
+        for p in phrases:
+            key = (cat, _normalize_phrase(p))
+            if key[1] and key not in seen:
+                seen.add(key)
+                bank.append(key)
+    bank.sort(key=lambda x: len(x[1]), reverse=True)
+
+    return DetectorRules(
+        version=str(o.get("version", "builtin")),
+        category_weights=weights,
+        category_markers=markers,
+        mode_configs=modes,
+        coercion_request_cues=[_normalize_phrase(c) for c in cues],
+        phrase_bank=tuple((cat, _phrase_regex(p), max(p.split(" "), key=len)) for cat, p in bank),
+    )
+
+# (config mtime, rules) swapped as one object so readers never see a half-built rule set
+_ACTIVE_RULES: tuple[float | None, DetectorRules] = (None, build_rules())
+
+def get_rules(path: str = DETECTOR_CONFIG_PATH) -> DetectorRules:
+    global _ACTIVE_RULES
+    active_mtime, rules = _ACTIVE_RULES
+    try:
+        overrides, mtime = load_json_cached(path)
+    except ConfigFileError as e:
+        # keep serving the last good rule set; the mtime marks this version as seen
+        if e.mtime != active_mtime:
+            logger.warning("Ignoring detector config, keeping the previous rules: %s", e)
+            _ACTIVE_RULES = (e.mtime, rules)
+        return rules
+    if mtime == active_mtime:
+        return rules
+    try:
+        rules = build_rules(overrides)
+    except Exception as e:
+        logger.warning("Ignoring detector config %s, keeping the previous rules: %s", path, e)
+    _ACTIVE_RULES = (mtime, rules)
+    return rules
+
+def category_names(seen: Iterable[str] = ()) -> list[str]:
+    """
+    Categories of the active (hot-reloaded) rules in configured order, then
+    any names in `seen` the rules no longer define, so stored counts keyed by
+    category keep every name across a config reload.
+    """
+    names = list(get_rules().category_markers)
+    known = set(names)
+    names += [c for c in seen if c not in known]
+    return names
 
 def _dedupe_and_prefer_longer(spans: list[dict[str, Any]]) -> list[dict[str, Any]]:
     if not spans:
@@ -156,44 +268,40 @@ def _dedupe_and_prefer_longer(spans: list[dict[str, Any]]) -> list[dict[str, Any
             last_end = s["end"]
     return kept
 
-def _rule_assess(reply: str) -> tuple[dict[str, int], list[dict[str, Any]]]:
-    counts: dict[str, int] = {k: 0 for k in CATEGORY_MARKERS.keys()}
+def _rule_assess(reply: str, rules: DetectorRules | None = None) -> tuple[dict[str, int], list[dict[str, Any]]]:
+    rules = rules or get_rules()
+    counts: dict[str, int] = {k: 0 for k in rules.category_markers.keys()}
     spans: list[dict[str, Any]] = []
     text = reply or ""
+    # one folding pass; matches are mapped back so spans index the original reply
+    norm, src = normalize_text(text)
 
-    phrase_bank: list[tuple[str, str]] = []
-    for cat, phrases in CATEGORY_MARKERS.items():
-        for p in phrases:
-            phrase_bank.append((cat, p))
-
-    phrase_bank.sort(key=lambda x: len(x[1]), reverse=True)
-
-    for cat, p in phrase_bank:
-        found = _find_spans(text, p)
-        if found:
-            counts[cat] += len(found)
-            for (s, e) in found:
-                spans.append({"start": s, "end": e, "phrase": text[s:e], "category": cat})
+    for cat, pat, word in rules.phrase_bank:
+        if word not in norm:
+            continue
+        for m in pat.finditer(norm):
+            s, e = m.start(), m.end()
+            if src is not None:
+                s, e = src[s], src[e - 1] + 1
+            counts[cat] += 1
+            spans.append({"start": s, "end": e, "phrase": text[s:e], "category": cat})
 
     spans = _dedupe_and_prefer_longer(spans)
     return counts, spans
 
-def _compute_rule_score(counts: dict[str, int]) -> float:
+def _compute_rule_score(counts: dict[str, int], weights: dict[str, float] | None = None) -> float:
+    weights = CATEGORY_WEIGHTS if weights is None else weights
     total = 0.0
     for cat, c in counts.items():
-        w = CATEGORY_WEIGHTS.get(cat, 1.0)
+        w = weights.get(cat, 1.0)
         total += w * float(c)
     normalized = 1.0 - (2.718281828459045 ** (-0.35 * total))
     return max(0.0, min(1.0, normalized))
 
-def _prompt_requests_coercion(prompt: str) -> bool:
-    p = (prompt or "").lower()
-    return any(cue in p for cue in COERCION_REQUEST_CUES)
-
-def _compute_context_score(prompt: str, rule_score: float) -> float:
-    if _prompt_requests_coercion(prompt):
-        return 0.0
-    return min(1.0, rule_score)
+def _prompt_requests_coercion(prompt: str, cues: list[str] | None = None) -> bool:
+    p = _normalize_phrase(prompt)
+    cues = COERCION_REQUEST_CUES if cues is None else cues
+    return any(cue in p for cue in cues)
 
 def _label_from_score(score: int, low: float, high: float) -> str:
     if score >= high:
@@ -217,11 +325,13 @@ def assess(
     model_threshold: float = 0.5,
     mode: str = "Balanced",
 ) -> Assessment:
-    cfg = MODE_CONFIGS.get(mode, MODE_CONFIGS["Balanced"])
+    rules = get_rules()
+    cfg = rules.mode_configs.get(mode, rules.mode_configs["Balanced"])
 
-    categories, spans = _rule_assess(reply)
-    rule_score = _compute_rule_score(categories)
-    context_score = _compute_context_score(prompt, rule_score)
+    categories, spans = _rule_assess(reply, rules)
+    rule_score = _compute_rule_score(categories, rules.category_weights)
+    prompt_cue = _prompt_requests_coercion(prompt, rules.coercion_request_cues)
+    context_score = 0.0 if prompt_cue else min(1.0, rule_score)
 
     model_score: float | None
     if model_proba is None:
@@ -267,6 +377,7 @@ def assess(
         rule_score=rule_score,
         model_score=model_score,
         context_score=context_score,
+        prompt_cue=prompt_cue,
         fusion_weights=weights,
         mode=mode,
         model_threshold=float(model_threshold),
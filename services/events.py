@@ -0,0 +1,207 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from services.detector import Assessment, get_rules
+from utils.config import EVENTS_DIR
+
+EVENTS_FILE = "audit_events.jsonl"
+# Events waiting for the writer; when full, new events are dropped and counted.
+EVENT_QUEUE_SIZE = 10_000
+EVENT_BATCH = 256
+FLUSH_INTERVAL = 0.5
+# Rotate the live file at this size, keeping EVENT_BACKUPS older files (.1 newest).
+MAX_FILE_BYTES = 64 * 1024 * 1024
+EVENT_BACKUPS = 5
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def audit_event(
+    a: Assessment,
+    prompt: str,
+    reply: str,
+    source: str,
+    timings: dict[str, float] | None = None,
+    session: str | None = None,
+    requested_mode: str | None = None,
+) -> dict:
+    """
+    Compact, text-free record of one audit. `mode` is the mode whose weights
+    and label bands were applied (assess falls back to Balanced for unknown
+    modes); `requested_mode` is what the caller asked for.
+    """
+    rules = get_rules()
+    mode = a.mode if a.mode in rules.mode_configs else "Balanced"
+    cfg = rules.mode_configs[mode]
+    return {
+        "type": "audit",
+        "event_id": uuid.uuid4().hex,
+        "ts": time.time(),
+        "source": source,
+        "session": session,
+        "prompt_hash": text_hash(prompt),
+        "reply_hash": text_hash(reply),
+        "reply_chars": len(reply or ""),
+        "score": int(a.score),
+        "label": a.label,
+        "categories": {k: int(v) for k, v in (a.categories or {}).items() if v},
+        "model_proba": a.model_proba,
+        "model_score": a.model_score,
+        "rule_score": a.rule_score,
+        "context_score": a.context_score,
+        "prompt_cue": bool(a.prompt_cue),
+        "mode": mode,
+        "requested_mode": requested_mode if requested_mode is not None else a.mode,
+        "model_threshold": a.model_threshold,
+        "label_thresholds": [cfg["low"], cfg["high"]],
+        "detector_config": rules.version,
+        "timings_ms": {k: round(v, 3) for k, v in (timings or {}).items()},
+    }
+
+
+class EventWriter:
+    """
+    Appends events as JSON lines from a background thread. emit() only puts
+    on a bounded queue, so callers never touch the disk; the writer drains
+    it in batches, rotates the file by size and records how many events
+    were dropped while the queue was full.
+    """
+
+    def __init__(
+        self,
+        events_dir: str = EVENTS_DIR,
+        queue_size: int = EVENT_QUEUE_SIZE,
+        batch: int = EVENT_BATCH,
+        max_bytes: int = MAX_FILE_BYTES,
+        backups: int = EVENT_BACKUPS,
+    ):
+        self.path = os.path.join(events_dir, EVENTS_FILE)
+        self.batch = batch
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._reported_drops = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+
+    def emit(self, event: dict) -> bool:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            return False
+        with self._count_lock:
+            self.emitted += 1
+        return True
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ecg-events", daemon=True)
+                self._thread.start()
+
+    def _drain(self, first) -> list:
+        items = [first]
+        while len(items) < self.batch:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                self._write([])
+                continue
+            items = self._drain(first)
+            stop = any(e is None for e in items)
+            self._write([e for e in items if e is not None])
+            for _ in items:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, events: list[dict]) -> None:
+        dropped = self.dropped
+        if dropped > self._reported_drops:
+            events.append({"type": "dropped", "ts": time.time(), "count": dropped - self._reported_drops})
+            self._reported_drops = dropped
+        if not events:
+            return
+        data = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events).encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.written += len(events)
+        except OSError:
+            # the audit trail must never take the app down with it
+            with self._count_lock:
+                self.dropped += len(events)
+
+    def _rotate(self) -> None:
+        for k in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{k}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{k + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "rotations": self.rotations,
+        }
+
+
+WRITER = EventWriter()
+atexit.register(WRITER.close)
+
+
+def emit_audit(
+    a: Assessment,
+    prompt: str,
+    reply: str,
+    source: str,
+    timings: dict[str, float] | None = None,
+    session: str | None = None,
+    requested_mode: str | None = None,
+) -> None:
+    WRITER.emit(audit_event(a, prompt, reply, source, timings, session, requested_mode))
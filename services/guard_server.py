@@ -0,0 +1,340 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import events, monitoring
+from services.detector import assess, get_rules
+from services.inference import TARGET_P95_MS, AdaptiveTuner, calibrate, default_threads, load_settings, set_threads
+from services.sbert_lr import predict_proba_batch, warm_up
+from utils.config import load_threshold, mode_threshold
+
+logger = logging.getLogger(__name__)
+
+# Texts per embedder call, and how long the first request in a batch may
+# wait for others to join it.
+MAX_BATCH = 32
+MAX_WAIT_MS = 5.0
+# Texts waiting for the model; beyond this requests are rejected with 429.
+MAX_QUEUE = 1024
+MAX_BULK_ITEMS = 256
+MAX_BODY_BYTES = 4 * 1024 * 1024
+REQUEST_TIMEOUT = 30.0
+RETRY_AFTER_S = 1
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests and scores them with one
+    predict_proba_batch call per batch on a single worker thread. The queue
+    is bounded in texts, so a burst is refused up front instead of piling
+    up behind the model. With a tuner attached, batch size and wait come
+    from the tuner and every batch's request latencies are reported to it.
+    """
+
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS, max_queue: int = MAX_QUEUE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.tuner: AdaptiveTuner | None = None
+        self._pending: deque[tuple[list[str], Future, float]] = deque()
+        self._n_pending = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.texts = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name="ecg-guard-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._n_pending
+
+    def submit(self, texts: list[str]) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            # a single oversized request is still admitted into an empty queue
+            if self._n_pending and self._n_pending + len(texts) > self.max_queue:
+                self.rejected += 1
+                raise QueueFull()
+            self._pending.append((list(texts), fut, time.perf_counter()))
+            self._n_pending += len(texts)
+            self._cond.notify()
+        return fut
+
+    def _limits(self) -> tuple[int, float]:
+        tuner = self.tuner
+        if tuner is None:
+            return self.max_batch, self.max_wait
+        return tuner.batch_size, tuner.max_wait_ms / 1000.0
+
+    def _take(self) -> list[tuple[list[str], Future, float]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return []
+            max_batch, max_wait = self._limits()
+            deadline = time.monotonic() + max_wait
+            while self._n_pending < max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+
+            taken, n = [], 0
+            while self._pending and (not taken or n + len(self._pending[0][0]) <= max_batch):
+                item = self._pending.popleft()
+                taken.append(item)
+                n += len(item[0])
+            self._n_pending -= n
+            return taken
+
+    def _run(self) -> None:
+        while True:
+            taken = self._take()
+            if not taken:
+                return
+            texts = [t for ts, _, _ in taken for t in ts]
+            started = time.perf_counter()
+            try:
+                probs = predict_proba_batch(texts, batch_size=max(len(texts), 1))
+            except Exception as e:
+                for _, fut, _ in taken:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            self.batches += 1
+            self.texts += len(texts)
+            i = 0
+            for ts, fut, _ in taken:
+                fut.set_result([float(p) for p in probs[i:i + len(ts)]])
+                i += len(ts)
+            if self.tuner is not None:
+                # results are already delivered; a tuner bug must not stop the batcher
+                try:
+                    self.tuner.observe(len(texts), 1000.0 * (done - started), [1000.0 * (done - t) for _, _, t in taken])
+                except Exception:
+                    logger.exception("Inference tuner failed to record a batch")
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _request_threshold(body: dict, mode: str) -> float:
+    th = body.get("threshold")
+    if th is None:
+        return mode_threshold(load_threshold(), mode)
+    try:
+        th = float(th)
+    except (TypeError, ValueError):
+        raise BadRequest("threshold must be a number")
+    if not 0.0 < th < 1.0:
+        raise BadRequest("threshold must be between 0 and 1")
+    return th
+
+
+def _request_mode(body: dict) -> str:
+    mode = body.get("mode", "Balanced")
+    if mode not in get_rules().mode_configs:
+        raise BadRequest(f"unknown mode: {mode}")
+    return mode
+
+
+def _items(body: dict) -> list[tuple[str, str]]:
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        raise BadRequest("items must be a non-empty list")
+    if len(items) > MAX_BULK_ITEMS:
+        raise BadRequest(f"at most {MAX_BULK_ITEMS} items per request")
+    out = []
+    for it in items:
+        if not isinstance(it, dict) or not isinstance(it.get("reply"), str):
+            raise BadRequest("each item needs a string 'reply'")
+        out.append((str(it.get("prompt") or ""), it["reply"]))
+    return out
+
+
+class GuardServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen backlog; the default of 5 resets connections under bursts
+    request_queue_size = 128
+
+    def __init__(self, addr, batcher: MicroBatcher):
+        super().__init__(addr, GuardHandler)
+        self.batcher = batcher
+        self.ready = threading.Event()
+        self.started = time.time()
+
+    def score(self, body: dict, items: list[tuple[str, str]]) -> list[dict]:
+        mode = _request_mode(body)
+        th = _request_threshold(body, mode)
+        t0 = time.perf_counter()
+        fut = self.batcher.submit([reply for _, reply in items])
+        probs = fut.result(timeout=REQUEST_TIMEOUT)
+        # queueing + batched embedding, shared by every item of the request
+        model_ms = 1000.0 * (time.perf_counter() - t0)
+        out = []
+        for (prompt, reply), p in zip(items, probs):
+            t1 = time.perf_counter()
+            a = assess(prompt, reply, model_proba=p, model_threshold=th, mode=mode)
+            monitoring.record(a)
+            events.emit_audit(a, prompt, reply, "guard", {
+                "model_batch": model_ms,
+                "assess": 1000.0 * (time.perf_counter() - t1),
+            }, requested_mode=mode)
+            out.append(asdict(a))
+        return out
+
+
+class GuardHandler(BaseHTTPRequestHandler):
+    server: GuardServer
+
+    def log_message(self, fmt, *args):
+        # one line per request is too noisy at guard volumes
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if n <= 0:
+            raise BadRequest("empty body")
+        if n > MAX_BODY_BYTES:
+            raise BadRequest("body too large")
+        try:
+            body = json.loads(self.rfile.read(n))
+        except ValueError:
+            raise BadRequest("body is not valid JSON")
+        if not isinstance(body, dict):
+            raise BadRequest("body must be a JSON object")
+        return body
+
+    def do_GET(self):
+        srv = self.server
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok", "uptime_s": round(time.time() - srv.started, 1)})
+        elif self.path == "/readyz":
+            ready = srv.ready.is_set()
+            self._send(200 if ready else 503, {
+                "ready": ready,
+                "queue_depth": srv.batcher.depth,
+                "max_queue": srv.batcher.max_queue,
+                "batches": srv.batcher.batches,
+                "texts": srv.batcher.texts,
+                "rejected": srv.batcher.rejected,
+                "inference": srv.batcher.tuner.snapshot() if srv.batcher.tuner is not None else None,
+                "detector_config": get_rules().version,
+                "base_threshold": load_threshold(),
+            })
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        srv = self.server
+        if self.path not in ("/v1/assess", "/v1/assess/batch"):
+            self._send(404, {"error": "not found"})
+            return
+        if not srv.ready.is_set():
+            self._send(503, {"error": "model is loading"}, {"Retry-After": str(RETRY_AFTER_S)})
+            return
+        try:
+            body = self._body()
+            if self.path == "/v1/assess":
+                if not isinstance(body.get("reply"), str):
+                    raise BadRequest("'reply' must be a string")
+                result = srv.score(body, [(str(body.get("prompt") or ""), body["reply"])])[0]
+                self._send(200, result)
+            else:
+                self._send(200, {"results": srv.score(body, _items(body))})
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except QueueFull:
+            self._send(429, {"error": "guard is at capacity"}, {"Retry-After": str(RETRY_AFTER_S)})
+        except TimeoutError:
+            self._send(504, {"error": "scoring timed out"})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def serve(host: str, port: int, batcher: MicroBatcher, target_p95_ms: float | None = None) -> GuardServer:
+    """
+    Start warming the model in the background. With `target_p95_ms`, batch
+    size, wait and torch threads are tuned to it (from saved settings for the
+    same target, else by calibrating now) before the server reports ready.
+    If warm-up or calibration fails, the batcher keeps its fixed
+    max_batch/max_wait and the server reports ready anyway.
+    """
+    srv = GuardServer((host, port), batcher)
+
+    def _warm():
+        try:
+            warm_up("warm up")
+            if target_p95_ms is not None:
+                settings = load_settings()
+                if settings is None or settings.target_p95_ms != target_p95_ms or settings.concurrency != 1:
+                    settings = calibrate(target_p95_ms)
+                batcher.tuner = AdaptiveTuner(settings)
+        except Exception:
+            logger.exception(
+                "Warm-up or calibration failed; serving with max_batch=%d, max_wait_ms=%g",
+                batcher.max_batch, 1000.0 * batcher.max_wait,
+            )
+            batcher.tuner = None
+            # calibration may have stopped at any thread count
+            set_threads(default_threads(1))
+        finally:
+            srv.ready.set()
+
+    threading.Thread(target=_warm, name="ecg-guard-warmup", daemon=True).start()
+    return srv
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP guard service around the coercion detector.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max_batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max_wait_ms", type=float, default=MAX_WAIT_MS)
+    ap.add_argument("--max_queue", type=int, default=MAX_QUEUE)
+    ap.add_argument("--target_p95_ms", type=float, default=TARGET_P95_MS)
+    ap.add_argument("--fixed", action="store_true", help="use --max_batch/--max_wait_ms as given instead of tuning")
+    args = ap.parse_args()
+
+    batcher = MicroBatcher(args.max_batch, args.max_wait_ms, args.max_queue)
+    srv = serve(args.host, args.port, batcher, None if args.fixed else args.target_p95_ms)
+    print(f"Guard listening on http://{args.host}:{args.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        batcher.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import torch
+
+from services.sbert_lr import predict_proba_batch, warm_up
+
+# Latency a guard request should see at the 95th percentile: queueing,
+# batch wait and the embedder call together.
+TARGET_P95_MS = 250.0
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128)
+MAX_WAIT_CAP_MS = 20.0
+# Calibration repeats per (threads, batch size) and a typical reply for timing.
+CALIBRATION_REPEATS = 3
+CALIBRATION_TEXT = (
+    "I understand how you feel, but you really need to decide right now. "
+    "If you don't act today you will regret it, and everyone else already agreed."
+)
+# Runtime re-tuning: request latencies kept, and batches between adjustments.
+WINDOW = 1024
+RETUNE_EVERY = 100
+INFERENCE_CONFIG_PATH = os.path.join("models", "inference.json")
+
+
+@dataclass
+class InferenceSettings:
+    batch_size: int
+    max_wait_ms: float
+    threads: int
+    target_p95_ms: float = TARGET_P95_MS
+    # inference callers running at once when calibrated
+    concurrency: int = 1
+    # calibration measurements, (threads, batch size) -> latency / throughput
+    measured: list[dict] = field(default_factory=list)
+
+
+def cpu_budget() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def set_threads(n: int) -> None:
+    """torch intra-op threads for this process; shared by every caller of the embedder."""
+    torch.set_num_threads(max(1, int(n)))
+
+
+def thread_candidates(concurrency: int = 1) -> list[int]:
+    """Powers of two up to the cores each concurrent caller may use, plus that share itself."""
+    share = max(1, cpu_budget() // max(1, concurrency))
+    cands = {share}
+    n = 1
+    while n < share:
+        cands.add(n)
+        n *= 2
+    return sorted(cands)
+
+
+def _time_batch(texts: list[str], repeats: int) -> float:
+    """Slowest of `repeats` calls in ms; with a few repeats this stands in for the p95."""
+    worst = 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        predict_proba_batch(texts, batch_size=len(texts))
+        worst = max(worst, 1000.0 * (time.perf_counter() - t0))
+    return worst
+
+
+def choose(measured: list[dict], target_p95_ms: float, concurrency: int = 1) -> InferenceSettings:
+    """
+    Highest-throughput (threads, batch size) whose worst case fits the target.
+    A request can arrive just as a batch starts, so it may wait for that batch,
+    its own batching window and its own batch: 2 x latency + max_wait.
+    """
+    best = None
+    for m in measured:
+        if 2.0 * m["latency_ms"] > target_p95_ms:
+            continue
+        if best is None or m["texts_per_s"] > best["texts_per_s"]:
+            best = m
+    if best is None:
+        # nothing fits: the smallest, fastest configuration is as close as we get
+        best = min(measured, key=lambda m: (m["latency_ms"], -m["threads"]))
+    wait = min(MAX_WAIT_CAP_MS, max(0.0, (target_p95_ms - 2.0 * best["latency_ms"]) / 2.0))
+    return InferenceSettings(best["batch_size"], round(wait, 2), best["threads"], target_p95_ms, concurrency, measured)
+
+
+def calibrate(
+    target_p95_ms: float = TARGET_P95_MS,
+    concurrency: int = 1,
+    text: str = CALIBRATION_TEXT,
+    repeats: int = CALIBRATION_REPEATS,
+) -> InferenceSettings:
+    """
+    Time the embedder + classifier for each thread count and batch size and
+    pick settings for `target_p95_ms`. `concurrency` is how many callers run
+    inference at the same time, which caps the threads each may use.
+    """
+    warm_up(text)
+    measured = []
+    for threads in thread_candidates(concurrency):
+        set_threads(threads)
+        _time_batch([text], 1)  # first call at a new thread count pays pool start-up
+        for bs in BATCH_SIZES:
+            ms = _time_batch([text] * bs, repeats)
+            measured.append({
+                "threads": threads,
+                "batch_size": bs,
+                "latency_ms": round(ms, 2),
+                "texts_per_s": round(1000.0 * bs / max(ms, 1e-6), 1),
+            })
+            # latency only grows with the batch; stop once it alone exceeds the target
+            if ms > target_p95_ms:
+                break
+    settings = choose(measured, target_p95_ms, concurrency)
+    set_threads(settings.threads)
+    return settings
+
+
+def load_settings(path: str = INFERENCE_CONFIG_PATH) -> InferenceSettings | None:
+    try:
+        with open(path) as f:
+            obj = json.load(f)
+        return InferenceSettings(**obj)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def default_threads(concurrency: int, path: str = INFERENCE_CONFIG_PATH) -> int:
+    """Calibrated threads when the saved settings match `concurrency`, else an even share of the cores."""
+    s = load_settings(path)
+    if s is not None and s.concurrency == concurrency:
+        return s.threads
+    return max(1, cpu_budget() // max(1, concurrency))
+
+
+class AdaptiveTuner:
+    """
+    Keeps batch size and batching window within the p95 target while serving.
+    Each request's latency (queue wait + batch compute) and each batch's
+    compute time are recorded; every RETUNE_EVERY batches the window is
+    checked. When the batches themselves are too slow for the target, batch
+    size and wait are halved. When requests are late from queueing, or well
+    early while batches fill up, the batch size doubles back towards the
+    calibrated ceiling for throughput.
+    """
+
+    def __init__(self, settings: InferenceSettings):
+        self.settings = settings
+        self.ceiling = settings.batch_size
+        self.batch_size = settings.batch_size
+        self.max_wait_ms = settings.max_wait_ms
+        self._latencies: deque[float] = deque(maxlen=WINDOW)
+        self._compute: deque[float] = deque(maxlen=RETUNE_EVERY)
+        self._fill: deque[float] = deque(maxlen=RETUNE_EVERY)
+        self._lock = threading.Lock()
+        self._since = 0
+        self.adjustments = 0
+        set_threads(settings.threads)
+
+    def observe(self, n_texts: int, compute_ms: float, request_ms: list[float]) -> None:
+        with self._lock:
+            self._latencies.extend(request_ms)
+            self._compute.append(compute_ms)
+            self._fill.append(n_texts / max(1, self.batch_size))
+            self._since += 1
+            if self._since >= RETUNE_EVERY:
+                self._since = 0
+                self._retune()
+
+    def _retune(self) -> None:
+        if not self._latencies:
+            return
+        p95 = float(np.percentile(self._latencies, 95))
+        compute_p95 = float(np.percentile(self._compute, 95))
+        target = self.settings.target_p95_ms
+        can_grow = self.batch_size < self.ceiling
+        if p95 > target and 2.0 * compute_p95 > target and (self.batch_size > 1 or self.max_wait_ms > 0):
+            self.batch_size = max(1, self.batch_size // 2)
+            self.max_wait_ms = round(self.max_wait_ms / 2.0, 2)
+        elif can_grow and (p95 > target or (p95 < 0.5 * target and np.mean(self._fill) > 0.9)):
+            self.batch_size = min(self.ceiling, self.batch_size * 2)
+            self.max_wait_ms = self.settings.max_wait_ms
+        else:
+            return
+        self.adjustments += 1
+        # judge the new settings on their own latencies
+        self._latencies.clear()
+        self._compute.clear()
+        self._fill.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = list(self._latencies)
+        return {
+            "threads": self.settings.threads,
+            "batch_size": self.batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "calibrated_batch_size": self.ceiling,
+            "calibrated_max_wait_ms": self.settings.max_wait_ms,
+            "target_p95_ms": self.settings.target_p95_ms,
+            "observed_p95_ms": round(float(np.percentile(lat, 95)), 2) if lat else None,
+            "adjustments": self.adjustments,
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Calibrate batch size, batching window and torch threads for CPU inference.")
+    ap.add_argument("--target_p95_ms", type=float, default=TARGET_P95_MS)
+    ap.add_argument("--concurrency", type=int, default=1, help="processes or threads running inference at once")
+    ap.add_argument("--out", default=INFERENCE_CONFIG_PATH)
+    args = ap.parse_args()
+
+    s = calibrate(args.target_p95_ms, args.concurrency)
+    print(f"{'threads':>8}{'batch':>7}{'ms':>10}{'texts/s':>10}")
+    for m in s.measured:
+        print(f"{m['threads']:>8}{m['batch_size']:>7}{m['latency_ms']:>10.1f}{m['texts_per_s']:>10.1f}")
+    print(f"Chosen: threads={s.threads} batch_size={s.batch_size} max_wait_ms={s.max_wait_ms}")
+
+    with open(args.out, "w") as f:
+        json.dump(asdict(s), f, indent=2)
+    print("Saved:", args.out)
+
+if __name__ == "__main__":
+    main()
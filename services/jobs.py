@@ -0,0 +1,473 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+from services.arrow_io import iter_text_chunks
+from services.batch import write_raw_signals
+from services.dedup import Deduper
+from utils.config import BATCH_JOBS_DIR, BATCH_JOBS_TTL
+
+# Rows per checkpointed shard; a crash loses at most one shard of work.
+SHARD_ROWS = 5000
+# Distributed workers hold a shard for this long without renewing it; the
+# lease is renewed every LEASE_SECONDS / 3 while the shard is being scored.
+LEASE_SECONDS = 300.0
+POLL_SECONDS = 2.0
+
+
+def job_id(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def file_fingerprint(path: str) -> tuple[str, int, float]:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime
+
+
+def _atomic_write_text(path: str, text: str) -> None:
+    # unique temp name: distributed workers may write the same target concurrently
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BatchJob:
+    """
+    Durable batch scoring job. The input (CSV, Parquet or Arrow IPC) is read
+    in numbered shards of
+    `shard_rows`; each shard's raw signals are written to a temp file and
+    renamed into `shards/` only when complete, so a restarted job skips every
+    shard that already exists and resumes with the first missing one.
+    Exact (and optionally near-) deduplication is per shard so shards stay
+    independent of each other.
+    """
+
+    def __init__(
+        self,
+        job_dir: str,
+        input_path: str,
+        text_col: str,
+        shard_rows: int = SHARD_ROWS,
+        limit: int | None = None,
+        near_dupes: bool = False,
+    ):
+        self.job_dir = job_dir
+        self.input_path = input_path
+        self.text_col = text_col
+        self.shard_rows = int(shard_rows)
+        self.limit = limit
+        self.near_dupes = near_dupes
+        self.shard_dir = os.path.join(job_dir, "shards")
+        self.manifest_path = os.path.join(job_dir, "job.json")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.manifest = self._load_or_create_manifest()
+
+    @classmethod
+    def for_file(
+        cls,
+        input_path: str,
+        text_col: str,
+        jobs_dir: str = BATCH_JOBS_DIR,
+        shard_rows: int = SHARD_ROWS,
+        limit: int | None = None,
+        near_dupes: bool = False,
+        input_key=None,
+    ) -> "BatchJob":
+        """
+        Job keyed by the input file identity and options, so reruns resume.
+        `input_key` replaces the path/size/mtime identity for inputs already
+        named by their content (such as the app's uploads).
+        """
+        ident = file_fingerprint(input_path) if input_key is None else input_key
+        key = job_id(ident, text_col, int(shard_rows), limit, bool(near_dupes))
+        return cls(os.path.join(jobs_dir, key), input_path, text_col, shard_rows, limit, near_dupes)
+
+    def _load_or_create_manifest(self) -> dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        manifest = {
+            "input_path": os.path.abspath(self.input_path),
+            "text_col": self.text_col,
+            "shard_rows": self.shard_rows,
+            "limit": self.limit,
+            "near_dupes": self.near_dupes,
+            "n_shards": None,
+            "n_rows": None,
+        }
+        _atomic_write_text(self.manifest_path, json.dumps(manifest, indent=2))
+        return manifest
+
+    def shard_path(self, k: int) -> str:
+        return os.path.join(self.shard_dir, f"shard_{k:06d}.csv")
+
+    def _stats_path(self, k: int) -> str:
+        return os.path.join(self.shard_dir, f"shard_{k:06d}.json")
+
+    def completed_shards(self) -> list[int]:
+        done = []
+        for name in os.listdir(self.shard_dir):
+            if name.startswith("shard_") and name.endswith(".csv"):
+                done.append(int(name[len("shard_"):-len(".csv")]))
+        return sorted(done)
+
+    @property
+    def is_complete(self) -> bool:
+        n = self.manifest.get("n_shards")
+        return n is not None and len(self.completed_shards()) >= n
+
+    def run(self, on_progress: Callable[[int, int], None] | None = None) -> int:
+        """
+        Process every missing shard. on_progress(rows_done, rows_scored_now)
+        is called after each shard. Returns the total number of rows.
+        """
+        if self.is_complete:
+            return int(self.manifest["n_rows"])
+
+        done_shards = set(self.completed_shards())
+        rows = 0
+        scored = 0
+        k = 0
+        for chunk in iter_text_chunks(self.input_path, self.text_col, self.shard_rows):
+            if self.limit is not None:
+                chunk = chunk.head(self.limit - rows)
+            if chunk.empty:
+                break
+
+            if k not in done_shards:
+                final = self.shard_path(k)
+                tmp = final + ".tmp"
+                deduper = Deduper(near=self.near_dupes)
+                write_raw_signals([chunk], self.text_col, tmp, deduper=deduper, start_row=rows)
+                with open(tmp, "rb") as f:
+                    os.fsync(f.fileno())
+                _atomic_write_text(
+                    self._stats_path(k),
+                    json.dumps({"rows": deduper.n_rows, "unique": deduper.n_clusters}),
+                )
+                os.replace(tmp, final)
+                scored += len(chunk)
+
+            rows += len(chunk)
+            k += 1
+            if on_progress is not None:
+                on_progress(rows, scored)
+            if self.limit is not None and rows >= self.limit:
+                break
+
+        self.manifest["n_shards"] = k
+        self.manifest["n_rows"] = rows
+        _atomic_write_text(self.manifest_path, json.dumps(self.manifest, indent=2))
+        return rows
+
+    def dedup_stats(self) -> tuple[int, int]:
+        """(rows, rows actually scored) over all completed shards."""
+        rows = unique = 0
+        for k in self.completed_shards():
+            try:
+                with open(self._stats_path(k)) as f:
+                    s = json.load(f)
+            except (OSError, ValueError):
+                continue
+            rows += s["rows"]
+            unique += s["unique"]
+        return rows, unique
+
+    def merge(self, out_path: str) -> str:
+        """Concatenate completed shards, in shard order, into one raw-signals CSV."""
+        if not self.is_complete:
+            raise RuntimeError(f"job {self.job_dir} is not complete")
+        tmp = out_path + ".tmp"
+        with open(tmp, "wb") as out:
+            for i, k in enumerate(range(self.manifest["n_shards"])):
+                with open(self.shard_path(k), "rb") as f:
+                    if i > 0:
+                        f.readline()  # header
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp, out_path)
+        return out_path
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
+def sweep_jobs_dir(jobs_dir: str = BATCH_JOBS_DIR, max_age: float = BATCH_JOBS_TTL) -> int:
+    """
+    Remove job directories and files under `jobs_dir/uploads` that have not
+    been modified for `max_age` seconds. A job's age is its newest shard, so
+    jobs still being scored are kept; an upload's age is that of its
+    `.inuse` marker when it has one. Returns the number of entries removed.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    uploads = os.path.join(jobs_dir, "uploads")
+    try:
+        names = set(os.listdir(uploads))
+    except FileNotFoundError:
+        names = set()
+    # markers go with their upload; orphaned ones are swept on their own
+    entries = [os.path.join(uploads, n) for n in names if not (n.endswith(".inuse") and n[:-6] in names)]
+    try:
+        entries += [os.path.join(jobs_dir, n) for n in os.listdir(jobs_dir) if n != "uploads"]
+    except FileNotFoundError:
+        pass
+    for path in entries:
+        try:
+            mtime = os.path.getmtime(path)
+            if os.path.isdir(path):
+                shards = os.path.join(path, "shards")
+                if os.path.isdir(shards):
+                    mtime = max(mtime, os.path.getmtime(shards))
+            elif os.path.exists(path + ".inuse"):
+                mtime = max(mtime, os.path.getmtime(path + ".inuse"))
+        except FileNotFoundError:
+            continue
+        if mtime >= cutoff:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            try:
+                os.remove(path + ".inuse")
+            except FileNotFoundError:
+                pass
+        removed += 1
+    return removed
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class DistributedJob(BatchJob):
+    """
+    BatchJob whose shards are scored by any number of worker processes on
+    any hosts sharing `job_dir`. plan() writes each shard's input as its own
+    Parquet file and records the shard count in the manifest; workers claim
+    shards by creating `leases/shard_k.lease` with O_EXCL and renew it while
+    scoring. An expired lease is removed by whoever notices first and the
+    shard becomes claimable again. Shard outputs are deterministic, so a
+    shard finished twice by a slow and a fresh worker is harmless.
+
+    Lease expiry compares wall clocks across hosts, which are assumed to be
+    NTP-synced to well within LEASE_SECONDS.
+    """
+
+    def __init__(self, job_dir: str, *args, lease_seconds: float = LEASE_SECONDS, **kwargs):
+        super().__init__(job_dir, *args, **kwargs)
+        self.lease_seconds = lease_seconds
+        self.input_dir = os.path.join(job_dir, "inputs")
+        self.lease_dir = os.path.join(job_dir, "leases")
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    @classmethod
+    def open(cls, job_dir: str, lease_seconds: float = LEASE_SECONDS) -> "DistributedJob":
+        """Attach to a job planned elsewhere; only the shared job directory is needed."""
+        with open(os.path.join(job_dir, "job.json")) as f:
+            m = json.load(f)
+        return cls(
+            job_dir, m["input_path"], m["text_col"], m["shard_rows"], m["limit"], m["near_dupes"],
+            lease_seconds=lease_seconds,
+        )
+
+    @property
+    def is_planned(self) -> bool:
+        return self.manifest.get("n_shards") is not None
+
+    def input_shard_path(self, k: int) -> str:
+        return os.path.join(self.input_dir, f"shard_{k:06d}.parquet")
+
+    def lease_path(self, k: int) -> str:
+        return os.path.join(self.lease_dir, f"shard_{k:06d}.lease")
+
+    def plan(self) -> int:
+        """Split the input into per-shard files (once); returns the number of shards."""
+        if self.is_planned:
+            return int(self.manifest["n_shards"])
+        rows = 0
+        k = 0
+        for chunk in iter_text_chunks(self.input_path, self.text_col, self.shard_rows):
+            if self.limit is not None:
+                chunk = chunk.head(self.limit - rows)
+            if chunk.empty:
+                break
+            tmp = self.input_shard_path(k) + ".tmp"
+            chunk[[self.text_col]].reset_index(drop=True).to_parquet(tmp, index=False)
+            os.replace(tmp, self.input_shard_path(k))
+            rows += len(chunk)
+            k += 1
+            if self.limit is not None and rows >= self.limit:
+                break
+        # the shard count is written last: its presence means planning finished
+        self.manifest["n_shards"] = k
+        self.manifest["n_rows"] = rows
+        _atomic_write_text(self.manifest_path, json.dumps(self.manifest, indent=2))
+        return k
+
+    def _read_lease(self, k: int) -> dict | None:
+        try:
+            with open(self.lease_path(k)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _lease_body(self, worker: str) -> str:
+        return json.dumps({"worker": worker, "expires": time.time() + self.lease_seconds})
+
+    def claim(self, worker: str) -> int | None:
+        done = set(self.completed_shards())
+        for k in range(int(self.manifest["n_shards"])):
+            if k in done:
+                continue
+            try:
+                fd = os.open(self.lease_path(k), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(self._lease_body(worker))
+            # finished by someone else between the listing and the claim
+            if os.path.exists(self.shard_path(k)):
+                self.release(k, worker)
+                continue
+            return k
+        return None
+
+    def renew(self, k: int, worker: str) -> bool:
+        lease = self._read_lease(k)
+        if lease is None or lease.get("worker") != worker:
+            return False
+        _atomic_write_text(self.lease_path(k), self._lease_body(worker))
+        return True
+
+    def release(self, k: int, worker: str) -> None:
+        # after an expiry the lease may already belong to someone else
+        lease = self._read_lease(k)
+        if lease is None or lease.get("worker") != worker:
+            return
+        try:
+            os.remove(self.lease_path(k))
+        except OSError:
+            pass
+
+    def reclaim_expired(self) -> list[int]:
+        """Drop leases whose holder stopped renewing; returns the reopened shards."""
+        reclaimed = []
+        now = time.time()
+        for name in os.listdir(self.lease_dir):
+            if not name.endswith(".lease"):
+                continue
+            k = int(name[len("shard_"):-len(".lease")])
+            lease = self._read_lease(k)
+            if lease is not None and lease.get("expires", 0) > now:
+                continue
+            if lease is None:
+                # empty or half-written: judge a just-created lease by its age
+                try:
+                    if os.path.getmtime(self.lease_path(k)) > now - self.lease_seconds:
+                        continue
+                except OSError:
+                    continue
+            # rename first so only one reclaimer wins, then delete the tombstone
+            tomb = os.path.join(self.lease_dir, f"{name}.{worker_id()}.expired")
+            try:
+                os.rename(self.lease_path(k), tomb)
+            except OSError:
+                continue
+            os.remove(tomb)
+            reclaimed.append(k)
+        return sorted(reclaimed)
+
+    def score_shard(self, k: int) -> int:
+        chunk = pd.read_parquet(self.input_shard_path(k))
+        final = self.shard_path(k)
+        tmp = f"{final}.{worker_id()}.tmp"
+        deduper = Deduper(near=self.near_dupes)
+        write_raw_signals([chunk], self.text_col, tmp, deduper=deduper, start_row=k * self.shard_rows)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        _atomic_write_text(self._stats_path(k), json.dumps({"rows": deduper.n_rows, "unique": deduper.n_clusters}))
+        os.replace(tmp, final)
+        return len(chunk)
+
+    def wait_for_plan(self) -> None:
+        while not self.is_planned:
+            time.sleep(POLL_SECONDS)
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def work(self, worker: str | None = None, on_shard: Callable[[int, int], None] | None = None) -> int:
+        """
+        Claim and score shards until every shard is complete or the job
+        directory has been removed after merging, picking up shards whose
+        lease expires meanwhile. Returns the shards this worker scored.
+        """
+        worker = worker or worker_id()
+        n = 0
+        try:
+            self.wait_for_plan()
+            while not self.is_complete:
+                self.reclaim_expired()
+                k = self.claim(worker)
+                if k is None:
+                    time.sleep(POLL_SECONDS)
+                    continue
+
+                stop = threading.Event()
+
+                def _heartbeat():
+                    while not stop.wait(self.lease_seconds / 3.0):
+                        try:
+                            self.renew(k, worker)
+                        except FileNotFoundError:
+                            return
+
+                hb = threading.Thread(target=_heartbeat, name="ecg-lease", daemon=True)
+                hb.start()
+                try:
+                    rows = self.score_shard(k)
+                finally:
+                    stop.set()
+                    hb.join()
+                    self.release(k, worker)
+                n += 1
+                if on_shard is not None:
+                    on_shard(k, rows)
+        except FileNotFoundError:
+            # the coordinator removes the job directory once it has merged the
+            # job; any other missing file is a real error
+            if os.path.exists(self.manifest_path) and os.path.isdir(self.shard_dir):
+                raise
+        return n
+
+    def run(self, on_progress: Callable[[int, int], None] | None = None) -> int:
+        """Single-process use: plan, then score every shard in this process."""
+        self.plan()
+        scored = 0
+
+        def _on_shard(k: int, rows: int) -> None:
+            nonlocal scored
+            scored += rows
+            if on_progress is not None:
+                on_progress(self.dedup_stats()[0], scored)
+
+        self.work(on_shard=_on_shard)
+        return int(self.manifest["n_rows"])
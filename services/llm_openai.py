@@ -16,9 +16,10 @@ def _sanitize_messages(chat_messages: list[dict]) -> list[dict]:
     return cleaned
 
 
-def generate_reply(chat_messages: list[dict], model: str | None = None) -> str:
+def generate_reply(chat_messages: list[dict], model: str | None = None, client: OpenAI | None = None) -> str:
+    # client/model can be passed in to point at another endpoint (e.g. the load-test stub)
     model_name = model or st.secrets.get("OPENAI_MODEL", "gpt-4.1-nano")
-    client = _client()
+    client = client or _client()
     safe_messages = _sanitize_messages(chat_messages)
     resp = client.responses.create(
         model=model_name,
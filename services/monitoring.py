@@ -0,0 +1,269 @@
+import argparse
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from services.detector import category_names
+from utils.config import MONITOR_DIR
+
+# Risk scores are integers 0-100, so a 101-bin histogram is an exact,
+# mergeable quantile sketch. Model probabilities use fixed 1% bins.
+SCORE_BINS = 101
+PROBA_BINS = 100
+# Time-window rates: WINDOW_COUNT buckets of WINDOW_SECONDS (24h of 5-minute buckets).
+WINDOW_SECONDS = 300
+WINDOW_COUNT = 288
+SNAPSHOT_INTERVAL = 60.0
+SNAPSHOT_VERSION = 1
+
+LABELS = ("GREEN", "YELLOW", "RED")
+
+
+def _quantile(hist: np.ndarray, q: float, scale: float = 1.0) -> float | None:
+    n = int(hist.sum())
+    if n == 0:
+        return None
+    k = int(np.searchsorted(np.cumsum(hist), q * n, side="left"))
+    return min(k, len(hist) - 1) * scale
+
+
+def _add_hits(into: dict[str, int], hits: dict[str, int]) -> None:
+    for c, h in hits.items():
+        into[c] = into.get(c, 0) + int(h)
+
+
+class ScoreSketch:
+    """
+    Fixed-memory summary of a stream of assessments: score and probability
+    histograms, label and category counters, and a ring of time-window
+    buckets. Sketches from any number of processes merge by addition.
+    Category counters are keyed by name, so categories added through the
+    detector config are counted as well.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.score_hist = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.proba_hist = np.zeros(PROBA_BINS, dtype=np.int64)
+        self.labels = np.zeros(len(LABELS), dtype=np.int64)
+        # assessments with at least one marker of each category
+        self.categories: dict[str, int] = {}
+        # window start (epoch s) -> ([n, score sum, RED count], per-category hits)
+        self.windows: dict[int, tuple[np.ndarray, dict[str, int]]] = {}
+
+    def add(self, score: int, label: str, categories: dict[str, int], model_proba: float | None, ts: float) -> None:
+        score = max(0, min(SCORE_BINS - 1, int(score)))
+        cats = {c: 1 for c, v in categories.items() if int(v) > 0}
+
+        self.n += 1
+        self.score_hist[score] += 1
+        if model_proba is not None:
+            self.proba_hist[min(PROBA_BINS - 1, max(0, int(float(model_proba) * PROBA_BINS)))] += 1
+        if label in LABELS:
+            self.labels[LABELS.index(label)] += 1
+        _add_hits(self.categories, cats)
+
+        start = int(ts // WINDOW_SECONDS) * WINDOW_SECONDS
+        w = self.windows.get(start)
+        if w is None:
+            w = self.windows[start] = (np.zeros(3, dtype=np.int64), {})
+            self._trim()
+        w[0][0] += 1
+        w[0][1] += score
+        w[0][2] += label == "RED"
+        _add_hits(w[1], cats)
+
+    def _trim(self) -> None:
+        if len(self.windows) > WINDOW_COUNT:
+            for start in sorted(self.windows)[:-WINDOW_COUNT]:
+                del self.windows[start]
+
+    def merge(self, other: "ScoreSketch") -> "ScoreSketch":
+        self.n += other.n
+        self.score_hist += other.score_hist
+        self.proba_hist += other.proba_hist
+        self.labels += other.labels
+        _add_hits(self.categories, other.categories)
+        for start, (totals, hits) in other.windows.items():
+            if start in self.windows:
+                mine = self.windows[start]
+                mine[0][:] += totals
+                _add_hits(mine[1], hits)
+            else:
+                self.windows[start] = (totals.copy(), dict(hits))
+        self._trim()
+        return self
+
+    def category_names(self) -> list[str]:
+        seen = set(self.categories)
+        for _, hits in self.windows.values():
+            seen.update(hits)
+        return category_names(sorted(seen))
+
+    def to_dict(self) -> dict:
+        cats = self.category_names()
+        return {
+            "version": SNAPSHOT_VERSION,
+            "window_seconds": WINDOW_SECONDS,
+            "categories": cats,
+            "n": self.n,
+            "score_hist": self.score_hist.tolist(),
+            "proba_hist": self.proba_hist.tolist(),
+            "labels": dict(zip(LABELS, self.labels.tolist())),
+            "category_hits": [self.categories.get(c, 0) for c in cats],
+            "windows": {
+                str(k): totals.tolist() + [hits.get(c, 0) for c in cats]
+                for k, (totals, hits) in sorted(self.windows.items())
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ScoreSketch":
+        if d.get("version") != SNAPSHOT_VERSION or d.get("window_seconds") != WINDOW_SECONDS:
+            raise ValueError("incompatible monitoring snapshot")
+        sk = cls()
+        sk.n = int(d["n"])
+        sk.score_hist[:] = d["score_hist"]
+        sk.proba_hist[:] = d["proba_hist"]
+        sk.labels[:] = [d["labels"].get(l, 0) for l in LABELS]
+        # keyed by name so snapshots survive a change in categories or their order
+        saved = list(d["categories"])
+        sk.categories = {c: int(h) for c, h in zip(saved, d["category_hits"]) if h}
+        for k, v in d["windows"].items():
+            hits = {c: int(h) for c, h in zip(saved, v[3:]) if h}
+            sk.windows[int(k)] = (np.array(v[:3], dtype=np.int64), hits)
+        sk._trim()
+        return sk
+
+    def window_rates(self, since: float | None = None) -> list[dict]:
+        cats = self.category_names()
+        rows = []
+        for start, (w, hits) in sorted(self.windows.items()):
+            if since is not None and start < since:
+                continue
+            n = int(w[0])
+            rows.append({
+                "start": start,
+                "n": n,
+                "per_minute": 60.0 * n / WINDOW_SECONDS,
+                "mean_score": float(w[1]) / n if n else None,
+                "red_rate": float(w[2]) / n if n else None,
+                "category_rates": {c: hits.get(c, 0) / n if n else None for c in cats},
+            })
+        return rows
+
+    def summary(self) -> dict:
+        n = self.n
+        return {
+            "n": n,
+            "score_quantiles": {f"p{int(q * 100)}": _quantile(self.score_hist, q) for q in (0.5, 0.9, 0.99)},
+            "proba_quantiles": {
+                f"p{int(q * 100)}": _quantile(self.proba_hist, q, 1.0 / PROBA_BINS) for q in (0.5, 0.9, 0.99)
+            },
+            "label_rates": {l: int(c) / n if n else None for l, c in zip(LABELS, self.labels)},
+            "category_rates": {c: self.categories.get(c, 0) / n if n else None for c in self.category_names()},
+        }
+
+
+class ScoreMonitor:
+    """
+    Process-wide sketch fed by every assessment. Snapshots its cumulative
+    state to `<monitor_dir>/<host>-<pid>.json` at most every
+    SNAPSHOT_INTERVAL seconds; merge_snapshots() combines all of them.
+    """
+
+    def __init__(self, monitor_dir: str = MONITOR_DIR, interval: float = SNAPSHOT_INTERVAL):
+        self.monitor_dir = monitor_dir
+        self.interval = interval
+        self.sketch = ScoreSketch()
+        self._lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+        self.path = os.path.join(monitor_dir, f"{socket.gethostname()}-{os.getpid()}.json")
+
+    def record(self, a) -> None:
+        with self._lock:
+            self.sketch.add(a.score, a.label, a.categories or {}, a.model_proba, time.time())
+            due = time.monotonic() - self._last_snapshot >= self.interval
+            if due:
+                self._last_snapshot = time.monotonic()
+                payload = json.dumps(self.sketch.to_dict())
+        if due:
+            self._write(payload)
+
+    def snapshot(self) -> str:
+        with self._lock:
+            self._last_snapshot = time.monotonic()
+            payload = json.dumps(self.sketch.to_dict())
+        self._write(payload)
+        return self.path
+
+    def _write(self, payload: str) -> None:
+        try:
+            os.makedirs(self.monitor_dir, exist_ok=True)
+            tmp = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError:
+            # monitoring must never break an audit
+            pass
+
+
+MONITOR = ScoreMonitor()
+
+
+@atexit.register
+def _final_snapshot() -> None:
+    if MONITOR.sketch.n:
+        MONITOR.snapshot()
+
+
+def record(a) -> None:
+    MONITOR.record(a)
+
+
+def merge_snapshots(monitor_dir: str = MONITOR_DIR) -> ScoreSketch:
+    total = ScoreSketch()
+    if not os.path.isdir(monitor_dir):
+        return total
+    for name in sorted(os.listdir(monitor_dir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(monitor_dir, name)) as f:
+                total.merge(ScoreSketch.from_dict(json.load(f)))
+        except (OSError, ValueError, KeyError):
+            continue
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge monitoring snapshots and print fleet-wide risk distributions.")
+    ap.add_argument("--dir", default=MONITOR_DIR)
+    ap.add_argument("--hours", type=float, default=1.0, help="recent period compared against the whole sketch")
+    args = ap.parse_args()
+
+    sk = merge_snapshots(args.dir)
+    summary = sk.summary()
+    print(json.dumps(summary, indent=2))
+    if sk.n == 0:
+        return
+
+    recent = sk.window_rates(since=time.time() - 3600.0 * args.hours)
+    n_recent = sum(r["n"] for r in recent)
+    if n_recent == 0:
+        print(f"No audits in the last {args.hours:g}h.")
+        return
+    print(f"\nLast {args.hours:g}h ({n_recent:,} audits) vs all time:")
+    print(f"{'category':<28}{'recent':>10}{'all time':>10}")
+    for c in summary["category_rates"]:
+        rate = sum((r["category_rates"][c] or 0.0) * r["n"] for r in recent) / n_recent
+        print(f"{c:<28}{rate:>10.3f}{summary['category_rates'][c]:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services import events, inference, monitoring, shadow
+from services.detector import Assessment, assess
+from services.sbert_lr import embed, proba_from_embeddings, warm_up
+from utils.config import load_threshold, mode_threshold
+
+# Shared by all sessions in the Streamlit process; audits are CPU-bound and
+# short, so a small pool keeps them off the script thread without oversubscribing.
+AUDIT_WORKERS = 4
+_EXECUTOR = ThreadPoolExecutor(max_workers=AUDIT_WORKERS, thread_name_prefix="ecg-audit")
+_WARM: Future | None = None
+_WARM_LOCK = threading.Lock()
+
+
+def init_inference_threads() -> int:
+    """
+    Size torch's intra-op pool for the audit workers. Up to AUDIT_WORKERS
+    audits embed at once, so each gets its share of the cores (or the count
+    calibrated with `python -m services.inference --concurrency 4`). Call once
+    per process before the first audit; returns the thread count.
+    """
+    n = inference.default_threads(AUDIT_WORKERS)
+    inference.set_threads(n)
+    return n
+
+
+def audit_reply(prompt: str, reply: str, mode: str, session: str | None = None, source: str = "chat") -> Assessment:
+    model_threshold = mode_threshold(load_threshold(), mode)
+    t0 = time.perf_counter()
+    X = embed([reply])
+    t1 = time.perf_counter()
+    p = float(proba_from_embeddings(X)[0])
+    t2 = time.perf_counter()
+    a = assess(prompt, reply, model_proba=p, model_threshold=model_threshold, mode=mode)
+    t3 = time.perf_counter()
+    monitoring.record(a)
+    events.emit_audit(a, prompt, reply, source, {
+        "embed": 1000.0 * (t1 - t0),
+        "classify": 1000.0 * (t2 - t1),
+        "assess": 1000.0 * (t3 - t2),
+        "total": 1000.0 * (t3 - t0),
+    }, session, requested_mode=mode)
+    # candidate model (if any) scores the same embedding on its own worker
+    shadow.submit(prompt, reply, mode, a, X, 1000.0 * (t3 - t0), 1000.0 * (t1 - t0))
+    return a
+
+
+def submit_prewarm() -> Future:
+    """
+    Load the embedder/classifier in the background, once per process (again
+    only if loading failed), so the first audit does not pay for it. Later
+    calls return the same future.
+    """
+    global _WARM
+    with _WARM_LOCK:
+        if _WARM is None or (_WARM.done() and _WARM.exception() is not None):
+            _WARM = _EXECUTOR.submit(warm_up, "warm up")
+        return _WARM
+
+
+def _audit_after(warm: Future | None, prompt: str, reply: str, mode: str, session: str | None) -> Assessment:
+    if warm is not None:
+        try:
+            warm.result()
+        except Exception:
+            # warm-up is best effort; audit_reply loads whatever is missing
+            pass
+    return audit_reply(prompt, reply, mode, session)
+
+
+def submit_audit(
+    prompt: str, reply: str, mode: str, warm: Future | None = None, session: str | None = None
+) -> Future:
+    return _EXECUTOR.submit(_audit_after, warm, prompt, reply, mode, session)
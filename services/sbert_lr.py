@@ -1,26 +1,98 @@
 import os
+import threading
 import joblib
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
-_EMBEDDER = None
-_MODEL = None
+from services.static_embedder import StaticEmbedder
 
-def _get_embedder():
-    global _EMBEDDER
-    if _EMBEDDER is None:
-        _EMBEDDER = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    return _EMBEDDER
+EMBEDDER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_PATH = os.path.join("models", "lr_coercion.joblib")
 
-def _get_model():
-    global _MODEL
-    if _MODEL is None:
-        path = os.path.join("models", "lr_coercion.joblib")
-        _MODEL = joblib.load(path)
-    return _MODEL
+# Distilled static-embedding tier (models/distill_static.py + train_lr_hh.py --tier static).
+STATIC_EMBEDDER_PATH = os.path.join("models", "static_embedder.npz")
+STATIC_MODEL_PATH = os.path.join("models", "lr_coercion_static.joblib")
+# The static head's probabilities are on their own scale, so it keeps its own tuned threshold.
+STATIC_THRESHOLD_PATH = os.path.join("models", "threshold_static.json")
+
+# tier -> (embedder name or .npz path, classifier path)
+TIERS = {
+    "full": (EMBEDDER_NAME, MODEL_PATH),
+    "static": (STATIC_EMBEDDER_PATH, STATIC_MODEL_PATH),
+}
+# Static-tier probabilities inside this band are re-scored by the full model.
+PRESCREEN_BAND = (0.2, 0.8)
+
+# keyed by embedder name / model path so a shadow candidate can load next to the primary
+_EMBEDDERS: dict[str, SentenceTransformer | StaticEmbedder] = {}
+_MODELS: dict[str, object] = {}
+_LOAD_LOCK = threading.Lock()
+
+def _get_embedder(name: str = EMBEDDER_NAME):
+    embedder = _EMBEDDERS.get(name)
+    if embedder is None:
+        with _LOAD_LOCK:
+            embedder = _EMBEDDERS.get(name)
+            if embedder is None:
+                if name.endswith(".npz"):
+                    embedder = StaticEmbedder.load(name)
+                else:
+                    embedder = SentenceTransformer(name)
+                _EMBEDDERS[name] = embedder
+    return embedder
+
+def _get_model(path: str = MODEL_PATH):
+    model = _MODELS.get(path)
+    if model is None:
+        with _LOAD_LOCK:
+            model = _MODELS.get(path)
+            if model is None:
+                model = _MODELS[path] = joblib.load(path)
+    return model
+
+def warm_up(text: str = "") -> None:
+    embedder = _get_embedder()
+    _get_model()
+    if text:
+        embedder.encode([str(text)], convert_to_numpy=True, show_progress_bar=False)
+
+def embed(texts: list[str], name: str = EMBEDDER_NAME, batch_size: int = 64) -> np.ndarray:
+    return _get_embedder(name).encode(
+        [str(t) for t in texts],
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+
+def proba_from_embeddings(X: np.ndarray, path: str = MODEL_PATH) -> np.ndarray:
+    return _get_model(path).predict_proba(X)[:, 1].astype(np.float64)
 
 def predict_proba(text: str) -> float:
     embedder = _get_embedder()
     model = _get_model()
     X = embedder.encode([str(text)], convert_to_numpy=True, show_progress_bar=False)
     p = model.predict_proba(X)[0, 1]
-    return float(p)
\ No newline at end of file
+    return float(p)
+
+def predict_proba_batch(texts: list[str], batch_size: int = 64, tier: str = "full") -> np.ndarray:
+    if len(texts) == 0:
+        return np.empty(0, dtype=np.float64)
+    name, path = TIERS[tier]
+    return proba_from_embeddings(embed(texts, name=name, batch_size=batch_size), path)
+
+def predict_proba_prescreen(
+    texts: list[str],
+    band: tuple[float, float] = PRESCREEN_BAND,
+    batch_size: int = 64,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score everything with the static tier and send only rows whose static
+    probability falls inside `band` to the transformer. Returns the
+    probabilities and a mask of the rows the full model scored.
+    """
+    p = predict_proba_batch(texts, batch_size=1024, tier="static")
+    uncertain = (p > band[0]) & (p < band[1])
+    if uncertain.any():
+        idx = np.flatnonzero(uncertain)
+        p[idx] = predict_proba_batch([texts[i] for i in idx], batch_size=batch_size)
+    return p, uncertain
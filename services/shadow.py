@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.detector import Assessment, assess
+from services.sbert_lr import EMBEDDER_NAME, embed, proba_from_embeddings
+from utils.config import ConfigFileError, load_json_cached, load_threshold, mode_threshold
+
+# Shadow mode is on while this file exists, e.g.
+#   {"model_path": "models/lr_coercion_v2.joblib", "embedder": "...", "threshold": 0.5}
+# It is re-read on change, so a candidate can be swapped without a restart.
+SHADOW_CONFIG_PATH = os.path.join("models", "shadow.json")
+SHADOW_LOG_PATH = os.path.join("data", "shadow_log.jsonl")
+# Audits waiting for the candidate; beyond this new ones are dropped rather
+# than letting the shadow fall ever further behind live traffic.
+SHADOW_MAX_BACKLOG = 256
+
+# one worker: the candidate must never compete with the primary for cores
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ecg-shadow")
+_BACKLOG = 0
+_DROPPED = 0
+_LOCK = threading.Lock()
+
+
+def shadow_config(path: str = SHADOW_CONFIG_PATH) -> dict | None:
+    try:
+        obj, _ = load_json_cached(path)
+    except ConfigFileError:
+        return None
+    if obj is None or not obj.get("model_path"):
+        return None
+    return obj
+
+
+def _score_candidate(
+    cfg: dict,
+    prompt: str,
+    reply: str,
+    mode: str,
+    primary: Assessment,
+    X: np.ndarray | None,
+    primary_ms: float,
+    embed_ms: float,
+) -> dict:
+    embedder = cfg.get("embedder", EMBEDDER_NAME)
+    reused = X is not None and embedder == EMBEDDER_NAME
+
+    t0 = time.perf_counter()
+    if not reused:
+        X = embed([reply], name=embedder)
+    p = float(proba_from_embeddings(X, cfg["model_path"])[0])
+    base = cfg.get("threshold")
+    th = mode_threshold(load_threshold() if base is None else float(base), mode)
+    cand = assess(prompt, reply, model_proba=p, model_threshold=th, mode=mode)
+    candidate_ms = 1000.0 * (time.perf_counter() - t0)
+    # primary_ms includes the embedding; charge the reused one to the candidate
+    # too, so both sides cover the same stages
+    if reused:
+        candidate_ms += embed_ms
+
+    return {
+        "ts": time.time(),
+        "mode": mode,
+        "candidate_model": cfg["model_path"],
+        "embedder": embedder,
+        "reused_embedding": reused,
+        "primary": {"proba": primary.model_proba, "score": primary.score, "label": primary.label},
+        "candidate": {"proba": p, "score": cand.score, "label": cand.label},
+        "label_disagree": cand.label != primary.label,
+        "score_delta": cand.score - primary.score,
+        "primary_ms": primary_ms,
+        "candidate_ms": candidate_ms,
+        "latency_delta_ms": candidate_ms - primary_ms,
+    }
+
+
+def _run(
+    cfg: dict, prompt: str, reply: str, mode: str, primary: Assessment, X, primary_ms: float, embed_ms: float
+) -> None:
+    global _BACKLOG
+    try:
+        try:
+            rec = _score_candidate(cfg, prompt, reply, mode, primary, X, primary_ms, embed_ms)
+        except Exception as e:
+            rec = {"ts": time.time(), "candidate_model": cfg.get("model_path"), "error": f"{type(e).__name__}: {e}"}
+        log_path = cfg.get("log_path", SHADOW_LOG_PATH)
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with open(log_path, "a") as f:
+            f.write(json.dumps(rec) + "\n")
+    finally:
+        with _LOCK:
+            _BACKLOG -= 1
+
+
+def submit(
+    prompt: str,
+    reply: str,
+    mode: str,
+    primary: Assessment,
+    X: np.ndarray | None = None,
+    primary_ms: float = 0.0,
+    embed_ms: float = 0.0,
+) -> bool:
+    """
+    Queue a candidate scoring of an audited reply, if shadow mode is on.
+    `X` is the primary's embedding of `reply`, reused when the candidate
+    shares its embedder. `primary_ms` is the primary's whole audit (embed,
+    classify, assess) and `embed_ms` its embedding share, which is added to
+    the candidate's time when X is reused. Never blocks; returns False when
+    nothing was queued.
+    """
+    global _BACKLOG, _DROPPED
+    cfg = shadow_config()
+    if cfg is None:
+        return False
+    with _LOCK:
+        if _BACKLOG >= SHADOW_MAX_BACKLOG:
+            _DROPPED += 1
+            return False
+        _BACKLOG += 1
+    _EXECUTOR.submit(_run, cfg, prompt, reply, mode, primary, X, primary_ms, embed_ms)
+    return True
+
+
+def summarize_log(path: str = SHADOW_LOG_PATH) -> dict:
+    n = errors = disagree = reused = 0
+    deltas, lat = [], []
+    transitions: dict[str, int] = {}
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            if "error" in rec:
+                errors += 1
+                continue
+            n += 1
+            disagree += rec["label_disagree"]
+            reused += rec["reused_embedding"]
+            deltas.append(rec["score_delta"])
+            lat.append(rec["latency_delta_ms"])
+            key = f"{rec['primary']['label']}->{rec['candidate']['label']}"
+            transitions[key] = transitions.get(key, 0) + 1
+    out = {"audits": n, "errors": errors}
+    if n:
+        out.update({
+            "label_disagree_rate": disagree / n,
+            "reused_embedding_rate": reused / n,
+            "mean_score_delta": float(np.mean(deltas)),
+            "latency_delta_ms": {
+                "mean": float(np.mean(lat)),
+                "p50": float(np.percentile(lat, 50)),
+                "p99": float(np.percentile(lat, 99)),
+            },
+            "label_transitions": dict(sorted(transitions.items(), key=lambda kv: -kv[1])),
+        })
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize shadow-model disagreements and latency.")
+    ap.add_argument("--log", default=SHADOW_LOG_PATH)
+    args = ap.parse_args()
+    print(json.dumps(summarize_log(args.log), indent=2))
+
+if __name__ == "__main__":
+    main()
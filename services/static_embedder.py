@@ -0,0 +1,57 @@
+import numpy as np
+from tokenizers import Tokenizer
+
+# Longer texts are cut here; the transformer itself stops at 256 word pieces.
+STATIC_MAX_TOKENS = 512
+
+
+class StaticEmbedder:
+    """
+    Transformer-free sentence embedder distilled from all-MiniLM-L6-v2
+    (see models/distill_static.py). A text is the frequency-weighted mean of
+    its word-piece vectors, mapped by a linear layer fit to the full model's
+    sentence embeddings. encode() mirrors the SentenceTransformer call used by
+    services.sbert_lr so either can back a tier.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, vectors: np.ndarray, weights: np.ndarray, projection: np.ndarray):
+        self.tokenizer = tokenizer
+        self.tokenizer.no_truncation()
+        self.tokenizer.no_padding()
+        # token weights are folded into the lookup table once at load time
+        self.table = (vectors * weights[:, None]).astype(np.float32)
+        self.weights = weights.astype(np.float32)
+        self.projection = projection.astype(np.float32)
+
+    @classmethod
+    def load(cls, path: str) -> "StaticEmbedder":
+        with np.load(path, allow_pickle=False) as z:
+            tokenizer = Tokenizer.from_str(str(z["tokenizer"]))
+            return cls(tokenizer, z["vectors"], z["weights"], z["projection"])
+
+    def _pool(self, texts: list[str]) -> np.ndarray:
+        encs = self.tokenizer.encode_batch([str(t) for t in texts], add_special_tokens=False)
+        ids = [e.ids[:STATIC_MAX_TOKENS] for e in encs]
+        lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+        flat = np.fromiter((i for x in ids for i in x), dtype=np.int64, count=int(lengths.sum()))
+
+        out = np.zeros((len(ids), self.table.shape[1]), dtype=np.float32)
+        nonempty = lengths > 0
+        if flat.size:
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])[nonempty]
+            sums = np.add.reduceat(self.table[flat], starts, axis=0)
+            wsum = np.add.reduceat(self.weights[flat], starts)
+            out[nonempty] = sums / np.maximum(wsum, 1e-9)[:, None]
+        return out
+
+    def encode(self, texts: list[str], batch_size: int = 1024, **_) -> np.ndarray:
+        parts = []
+        for i in range(0, len(texts), max(1, batch_size)):
+            pooled = self._pool(texts[i:i + batch_size])
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-9)
+            X = pooled @ self.projection
+            X /= np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-9)
+            parts.append(X)
+        if not parts:
+            return np.empty((0, self.projection.shape[1]), dtype=np.float32)
+        return np.concatenate(parts)
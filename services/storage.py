@@ -0,0 +1,351 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from collections import deque
+from contextlib import closing
+
+import pandas as pd
+
+from services.arrow_io import to_bytes
+from services.detector import category_names
+from utils.config import LLM_CONTEXT_MESSAGES, SESSION_SPILL_DIR, SESSION_SPILL_TTL, SESSION_WINDOW
+
+REPORT_COLUMNS = [
+    "turn_id",
+    "user_prompt",
+    "assistant_reply",
+    "risk_score",
+    "rule_score",
+    "context_score",
+    "model_proba",
+    "model_score",
+    "explanation",
+]
+
+
+class CompactAudit:
+    """
+    Slotted, tuple-backed form of detector.Assessment for session storage.
+    Exposes the same read attributes the UI and report use. Marker counts and
+    span categories are keyed by (interned) category name, so categories
+    added through the detector config survive storage.
+    """
+
+    __slots__ = (
+        "turn_id",
+        "score",
+        "label",
+        "counts",
+        "span_tuples",
+        "explanation",
+        "model_proba",
+        "rule_score",
+        "model_score",
+        "context_score",
+        "weights",
+        "mode",
+        "model_threshold",
+        "prompt_cue",
+    )
+
+    def __init__(
+        self,
+        turn_id: int,
+        score: int,
+        label: str,
+        counts: tuple[tuple[str, int], ...],
+        span_tuples: tuple[tuple[int, int, str], ...],
+        explanation: str,
+        model_proba: float | None,
+        rule_score: float,
+        model_score: float | None,
+        context_score: float,
+        weights: tuple[float, float, float],
+        mode: str,
+        model_threshold: float,
+        prompt_cue: bool = False,
+    ):
+        self.turn_id = turn_id
+        self.score = score
+        self.label = label
+        self.counts = counts
+        self.span_tuples = span_tuples
+        self.explanation = explanation
+        self.model_proba = model_proba
+        self.rule_score = rule_score
+        self.model_score = model_score
+        self.context_score = context_score
+        self.weights = weights
+        self.mode = mode
+        self.model_threshold = model_threshold
+        self.prompt_cue = prompt_cue
+
+    @classmethod
+    def from_assessment(cls, turn_id: int, a) -> "CompactAudit":
+        # only non-zero counts are kept; `categories` fills in the zeros
+        counts = tuple((sys.intern(k), int(v)) for k, v in (a.categories or {}).items() if v)
+        spans = tuple(
+            (int(s["start"]), int(s["end"]), sys.intern(str(s.get("category", ""))))
+            for s in (a.spans or [])
+        )
+        w = a.fusion_weights or {}
+        return cls(
+            turn_id=int(turn_id),
+            score=int(a.score),
+            label=str(a.label),
+            counts=counts,
+            span_tuples=spans,
+            explanation=str(a.explanation),
+            model_proba=None if a.model_proba is None else float(a.model_proba),
+            rule_score=float(a.rule_score),
+            model_score=None if a.model_score is None else float(a.model_score),
+            context_score=float(a.context_score),
+            weights=(float(w.get("rule", 0.0)), float(w.get("model", 0.0)), float(w.get("context", 0.0))),
+            mode=str(a.mode),
+            model_threshold=float(a.model_threshold),
+            prompt_cue=bool(a.prompt_cue),
+        )
+
+    @property
+    def categories(self) -> dict[str, int]:
+        counts = dict(self.counts)
+        return {c: counts.get(c, 0) for c in category_names(counts)}
+
+    @property
+    def spans(self) -> list[dict]:
+        return [{"start": s, "end": e, "category": c} for s, e, c in self.span_tuples]
+
+    @property
+    def fusion_weights(self) -> dict[str, float]:
+        return dict(zip(("rule", "model", "context"), self.weights))
+
+    def to_json(self) -> str:
+        return json.dumps([getattr(self, k) for k in self.__slots__])
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CompactAudit":
+        vals = json.loads(raw)
+        obj = cls(*vals)
+        obj.counts = tuple((sys.intern(k), v) for k, v in obj.counts)
+        obj.span_tuples = tuple((s, e, sys.intern(c)) for s, e, c in obj.span_tuples)
+        obj.weights = tuple(obj.weights)
+        return obj
+
+
+class SessionHistory:
+    """
+    Chat history with a bounded in-memory window. Messages that fall out of
+    the window are spilled to a per-session SQLite file and paged back in on
+    demand (scrolling back, exports).
+    """
+
+    def __init__(
+        self,
+        system_prompt: str = "You are a helpful assistant.",
+        window: int = SESSION_WINDOW,
+        spill_dir: str = SESSION_SPILL_DIR,
+    ):
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.window = max(1, int(window))
+        self.recent: deque[dict] = deque()
+        self.spilled = 0
+        self.audit_count = 0
+        self.last_audit: CompactAudit | None = None
+        self.session_id = uuid.uuid4().hex
+        self._spill_path = os.path.join(spill_dir, f"{self.session_id}.sqlite3")
+        self._spill_ready = False
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.recent)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._spill_ready or not os.path.exists(self._spill_path):
+            os.makedirs(os.path.dirname(self._spill_path), exist_ok=True)
+            with closing(sqlite3.connect(self._spill_path)) as con, con:
+                con.execute(
+                    "CREATE TABLE IF NOT EXISTS messages "
+                    "(idx INTEGER PRIMARY KEY, role TEXT, content TEXT, audit TEXT)"
+                )
+            self._spill_ready = True
+        return sqlite3.connect(self._spill_path)
+
+    def _spill(self) -> None:
+        rows = []
+        while len(self.recent) > self.window:
+            m = self.recent.popleft()
+            audit = m.get("audit")
+            rows.append((self.spilled, m["role"], m["content"], None if audit is None else audit.to_json()))
+            self.spilled += 1
+        if rows:
+            with closing(self._connect()) as con, con:
+                con.executemany("INSERT INTO messages VALUES (?, ?, ?, ?)", rows)
+
+    def _new_audit(self, assessment) -> CompactAudit:
+        audit = CompactAudit.from_assessment(self.audit_count, assessment)
+        self.audit_count += 1
+        self.last_audit = audit
+        return audit
+
+    def append(self, role: str, content: str, assessment=None) -> CompactAudit | None:
+        m = {"role": role, "content": content}
+        audit = None
+        if assessment is not None:
+            audit = self._new_audit(assessment)
+            m["audit"] = audit
+        self.recent.append(m)
+        self._spill()
+        return audit
+
+    def attach_audit(self, assessment) -> CompactAudit | None:
+        # audits finish after the reply is shown; attach to the newest assistant turn
+        for m in reversed(self.recent):
+            if m["role"] == "assistant":
+                if m.get("audit") is not None:
+                    return None
+                m["audit"] = self._new_audit(assessment)
+                return m["audit"]
+        return None
+
+    def messages(self) -> list[dict]:
+        return [self.system_message, *self.recent]
+
+    def context_messages(self, limit: int | None = LLM_CONTEXT_MESSAGES) -> list[dict]:
+        """
+        System message plus the conversation for the LLM: every message, or
+        the last `limit`, paging spilled turns back in as needed.
+        """
+        start = 0 if limit is None else max(0, len(self) - int(limit))
+        spilled = self.load_spilled(start, self.spilled)
+        return [self.system_message, *spilled, *list(self.recent)[max(0, start - self.spilled):]]
+
+    def load_spilled(self, start: int, stop: int) -> list[dict]:
+        start = max(0, start)
+        stop = min(self.spilled, stop)
+        if stop <= start:
+            return []
+        with closing(self._connect()) as con:
+            cur = con.execute(
+                "SELECT role, content, audit FROM messages WHERE idx >= ? AND idx < ? ORDER BY idx",
+                (start, stop),
+            )
+            out = []
+            for role, content, audit in cur:
+                m = {"role": role, "content": content}
+                if audit is not None:
+                    m["audit"] = CompactAudit.from_json(audit)
+                out.append(m)
+        return out
+
+    def iter_all(self, page_size: int = 500):
+        for start in range(0, self.spilled, page_size):
+            yield from self.load_spilled(start, start + page_size)
+        yield from list(self.recent)
+
+    def clear(self) -> None:
+        self.recent.clear()
+        self.spilled = 0
+        self.audit_count = 0
+        self.last_audit = None
+        if self._spill_ready:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_ready = False
+
+
+def sweep_spill_dir(spill_dir: str = SESSION_SPILL_DIR, max_age: float = SESSION_SPILL_TTL) -> int:
+    """Remove session spill files not modified for `max_age` seconds; returns how many."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(spill_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if not name.endswith(".sqlite3"):
+            continue
+        path = os.path.join(spill_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class SessionReport:
+    """
+    Running session summary, updated once per audited assistant turn.
+    Keeps running mean/max and category totals; report rows are paged out of
+    the session history only when an export is requested.
+    """
+
+    def __init__(self):
+        self.category_totals: dict[str, int] = {}
+        self.count = 0
+        self.avg_risk: float | None = None
+        self.max_risk: int | None = None
+        self.riskiest_turn_id: int | None = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, turn_id: int, a) -> None:
+        score = int(a.score)
+
+        self.count += 1
+        if self.avg_risk is None:
+            self.avg_risk = float(score)
+        else:
+            self.avg_risk += (score - self.avg_risk) / self.count
+
+        if self.max_risk is None or score > self.max_risk:
+            self.max_risk = score
+            self.riskiest_turn_id = int(turn_id)
+
+        for k, v in (a.categories or {}).items():
+            self.category_totals[k] = self.category_totals.get(k, 0) + int(v)
+
+    def summary(self) -> dict:
+        top_categories = sorted(self.category_totals.items(), key=lambda x: x[1], reverse=True)
+        top_categories = [k for k, v in top_categories if v > 0][:3]
+        return {
+            "avg_risk": self.avg_risk,
+            "max_risk": self.max_risk,
+            "riskiest_turn_id": self.riskiest_turn_id,
+            "top_categories": top_categories,
+            "category_totals": dict(self.category_totals),
+        }
+
+    @staticmethod
+    def rows(history: SessionHistory):
+        user_prompt = ""
+        for m in history.iter_all():
+            if m["role"] == "user":
+                user_prompt = m["content"]
+                continue
+            a = m.get("audit")
+            if m["role"] != "assistant" or a is None:
+                continue
+            yield (
+                a.turn_id,
+                user_prompt,
+                m["content"],
+                a.score,
+                a.rule_score,
+                a.context_score,
+                a.model_proba,
+                a.model_score,
+                a.explanation,
+            )
+
+    def to_frame(self, history: SessionHistory) -> pd.DataFrame:
+        return pd.DataFrame(list(self.rows(history)), columns=REPORT_COLUMNS)
+
+    def to_bytes(self, history: SessionHistory, fmt: str = "csv") -> bytes:
+        return to_bytes(self.to_frame(history), fmt)
@@ -0,0 +1,202 @@
+import re
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from services.arrow_io import TableWriter
+from services.batch import BATCH_CHUNK_ROWS, TEXT_PREVIEW_CHARS, label_from_scores, raw_signals, score_frame
+from services.conversation import ConversationRisk
+
+# hh-rlhf transcripts: "\n\nHuman: ...\n\nAssistant: ..." (the leading blank
+# lines are optional on the first turn).
+_SPEAKER = re.compile(r"(?:^|\n\n)(Human|Assistant):[ \t]*")
+
+
+def split_turns(transcript: str) -> list[tuple[str, str]]:
+    """
+    (prompt, reply) pairs, one per non-empty Assistant turn, each paired with
+    the nearest preceding Human turn ("" if there is none).
+    """
+    if not isinstance(transcript, str):
+        return []
+    pairs = []
+    prompt = ""
+    matches = list(_SPEAKER.finditer(transcript))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(transcript)
+        body = transcript[m.end():end].strip()
+        if m.group(1) == "Human":
+            prompt = body
+        elif body:
+            pairs.append((prompt, body))
+    return pairs
+
+
+class TranscriptScorer:
+    """
+    Streams transcripts into per-turn and per-conversation results. Turns are
+    buffered across transcripts and scored `chunk_turns` at a time with one
+    batched embedding pass, so short conversations still fill whole batches.
+    Turns of a conversation arrive contiguously, so only the conversation in
+    progress is kept open.
+    """
+
+    def __init__(
+        self,
+        turn_writer: TableWriter,
+        conv_writer: TableWriter,
+        model_threshold: float,
+        mode: str = "Balanced",
+        chunk_turns: int = BATCH_CHUNK_ROWS,
+    ):
+        self.turn_writer = turn_writer
+        self.conv_writer = conv_writer
+        self.model_threshold = model_threshold
+        self.mode = mode
+        self.chunk_turns = chunk_turns
+
+        self.n_transcripts = 0
+        self.n_turns = 0
+        self.n_conversations = 0
+
+        self._conv_ids: list = []
+        self._turn_ids: list[int] = []
+        self._prompts: list[str] = []
+        self._replies: list[str] = []
+
+        self._open_id = None
+        self._tracker: ConversationRisk | None = None
+        self._score_sum = 0
+        self._peak_turn = 0
+        self._conv_rows: list[dict] = []
+
+    def add(self, conversation_id, transcript: str) -> int:
+        """Queue one transcript; returns its number of assistant turns."""
+        self.n_transcripts += 1
+        pairs = split_turns(transcript)
+        for t, (prompt, reply) in enumerate(pairs):
+            self._conv_ids.append(conversation_id)
+            self._turn_ids.append(t)
+            self._prompts.append(prompt)
+            self._replies.append(reply)
+        if len(self._replies) >= self.chunk_turns:
+            self.flush()
+        return len(pairs)
+
+    def flush(self) -> None:
+        if not self._replies:
+            return
+        raw = raw_signals(self._replies, self._prompts)
+        raw.index = np.arange(self.n_turns, self.n_turns + len(raw))
+        scored = score_frame(raw, self.model_threshold, self.mode)
+
+        cats = [c for c in raw.columns if c.startswith("n_")]
+        counts = raw[cats].to_numpy()
+        context = raw["context_score"].to_numpy()
+        prompt_cue = raw["prompt_cue"].to_numpy()
+        scores = scored["risk_score"].to_numpy()
+
+        rolling = np.empty(len(raw), dtype=np.float64)
+        trend = np.empty(len(raw), dtype=np.float64)
+        alerts = np.empty(len(raw), dtype=object)
+        for i, (conv_id, turn_id) in enumerate(zip(self._conv_ids, self._turn_ids)):
+            if self._tracker is None or conv_id != self._open_id:
+                self._close_conversation()
+                self._open_id = conv_id
+                self._tracker = ConversationRisk()
+                self._score_sum = 0
+                self._peak_turn = turn_id
+            tr = self._tracker
+            score = int(scores[i])
+            if tr.peak_score is None or score > tr.peak_score:
+                self._peak_turn = turn_id
+            raised = tr.update_values(
+                turn_id, score, {c[2:]: counts[i, j] for j, c in enumerate(cats)}, bool(prompt_cue[i])
+            )
+            self._score_sum += score
+            rolling[i] = tr.rolling_score
+            trend[i] = tr.trend
+            alerts[i] = "; ".join(a["kind"] for a in raised)
+
+        self.turn_writer.write(pd.DataFrame({
+            "conversation_id": self._conv_ids,
+            "turn_id": self._turn_ids,
+            "prompt_preview": [p[:TEXT_PREVIEW_CHARS] for p in self._prompts],
+            "reply_preview": [r[:TEXT_PREVIEW_CHARS] for r in self._replies],
+            "risk_score": scores.astype(int),
+            "label": scored["label"].to_numpy(),
+            "model_proba": scored["model_proba"].to_numpy(),
+            "model_score": scored["model_score"].to_numpy(),
+            "context_score": context,
+            "prompt_cue": prompt_cue,
+            "explanation": scored["explanation"].to_numpy(),
+            "rolling_score": rolling.round(2),
+            "trend": trend.round(3),
+            "alerts": alerts,
+        }))
+        self.n_turns += len(raw)
+        self._conv_ids, self._turn_ids, self._prompts, self._replies = [], [], [], []
+
+        if self._conv_rows:
+            self._write_conversations()
+
+    def _close_conversation(self) -> None:
+        tr = self._tracker
+        if tr is None or tr.turns == 0:
+            return
+        self._conv_rows.append({
+            "conversation_id": self._open_id,
+            "n_turns": tr.turns,
+            "max_risk": tr.peak_score,
+            "mean_risk": round(self._score_sum / tr.turns, 2),
+            "riskiest_turn_id": self._peak_turn,
+            "final_rolling_score": round(tr.rolling_score, 2),
+            "final_trend": round(tr.trend, 3),
+            "n_alerts": len(tr.alerts),
+            "alerts": "; ".join(sorted({a["kind"] for a in tr.alerts})),
+        })
+        self._tracker = None
+        self.n_conversations += 1
+
+    def _write_conversations(self) -> None:
+        df = pd.DataFrame(self._conv_rows)
+        df.insert(4, "label", label_from_scores(df["max_risk"].to_numpy()))
+        self.conv_writer.write(df)
+        self._conv_rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self._close_conversation()
+        if self._conv_rows:
+            self._write_conversations()
+
+
+def score_transcripts(
+    chunks: Iterable[pd.DataFrame],
+    text_col: str,
+    scorer: TranscriptScorer,
+    id_col: str | None = None,
+    limit: int | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> tuple[int, int]:
+    """
+    Feed transcript chunks to `scorer`; conversations are identified by
+    `id_col` or, without one, by their row position in the input.
+    Returns (transcripts, turns).
+    """
+    for chunk in chunks:
+        if limit is not None:
+            chunk = chunk.head(limit - scorer.n_transcripts)
+        if chunk.empty:
+            break
+        start = scorer.n_transcripts
+        ids = chunk[id_col].tolist() if id_col else range(start, start + len(chunk))
+        for conv_id, text in zip(ids, chunk[text_col].tolist()):
+            scorer.add(conv_id, text)
+        if on_progress is not None:
+            on_progress(scorer.n_transcripts, scorer.n_turns)
+        if limit is not None and scorer.n_transcripts >= limit:
+            break
+    scorer.close()
+    return scorer.n_transcripts, scorer.n_turns
@@ -1,18 +1,106 @@
 import json
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 
 DEFAULT_THRESHOLD = 0.55
 MIN_THRESHOLD = 0.45
 MAX_THRESHOLD = 0.95
 
+# Config files are stat()ed for changes at most this often (seconds).
+CONFIG_CHECK_INTERVAL = 2.0
+
+class ConfigFileError(ValueError):
+    """A config file exists but is not a JSON object; `mtime` identifies that version of it."""
+
+    def __init__(self, path: str, mtime: float, reason: str):
+        super().__init__(f"{path}: {reason}")
+        self.path = path
+        self.mtime = mtime
+
+
+# path -> (last checked, mtime, parsed object or the error it raised)
+_JSON_CACHE: dict[str, tuple[float, float | None, dict | ConfigFileError | None]] = {}
+_JSON_LOCK = threading.Lock()
+
+def load_json_cached(path: str) -> tuple[dict | None, float | None]:
+    """
+    Parsed JSON object at `path` plus its mtime, re-read only when the file
+    changes. A missing file gives (None, None); a file that does not parse
+    to an object raises ConfigFileError (also cached until it changes).
+    """
+    now = time.monotonic()
+    cached = _JSON_CACHE.get(path)
+    if cached is not None and now - cached[0] < CONFIG_CHECK_INTERVAL:
+        if isinstance(cached[2], ConfigFileError):
+            raise cached[2]
+        return cached[2], cached[1]
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    if cached is not None and cached[1] == mtime:
+        obj = cached[2]
+    elif mtime is None:
+        obj = None
+    else:
+        try:
+            obj = json.loads(Path(path).read_text())
+            if not isinstance(obj, dict):
+                obj = ConfigFileError(path, mtime, f"expected a JSON object, got {type(obj).__name__}")
+        except Exception as e:
+            obj = ConfigFileError(path, mtime, str(e))
+
+    with _JSON_LOCK:
+        _JSON_CACHE[path] = (now, mtime, obj)
+    if isinstance(obj, ConfigFileError):
+        raise obj
+    return obj, mtime
+
 def load_threshold(path: str = "models/threshold.json") -> float:
-    p = Path(path)
-    if not p.exists():
+    try:
+        obj, _ = load_json_cached(path)
+    except ConfigFileError:
+        return DEFAULT_THRESHOLD
+    if obj is None:
         return DEFAULT_THRESHOLD
     try:
-        obj = json.loads(p.read_text())
         th = float(obj.get("threshold", DEFAULT_THRESHOLD))
     except Exception:
         return DEFAULT_THRESHOLD
     th = max(MIN_THRESHOLD, min(MAX_THRESHOLD, th))
-    return th
\ No newline at end of file
+    return th
+
+def mode_threshold(base_th: float, mode: str) -> float:
+    if mode == "Conservative":
+        return min(0.95, base_th + 0.10)
+    if mode == "Aggressive":
+        return max(0.01, base_th - 0.10)
+    return base_th
+
+# Number of chat messages kept in memory per session; older turns are spilled to disk.
+SESSION_WINDOW = 40
+SESSION_SPILL_DIR = os.path.join(tempfile.gettempdir(), "ethical_chat_guard_sessions")
+# Spill files not written to for this long belong to ended sessions and are removed at startup (seconds).
+SESSION_SPILL_TTL = 24 * 3600
+# Most recent chat messages sent to the LLM with each prompt; None sends the whole conversation.
+LLM_CONTEXT_MESSAGES: int | None = None
+
+# Checkpointed batch jobs (one directory per job, resumable after restarts).
+BATCH_JOBS_DIR = os.path.join("data", "batch_jobs")
+# Uploads and unfinished jobs untouched for this long are removed (seconds).
+BATCH_JOBS_TTL = 24 * 3600
+
+# Per-process score-distribution snapshots, merged for fleet-wide monitoring.
+MONITOR_DIR = os.path.join("data", "monitoring")
+
+# Structured audit events (JSON lines, rotated by size) for downstream tooling.
+EVENTS_DIR = os.path.join("data", "audit_events")
+
+# Labelled datasets converted to memory-mapped Arrow, with their splits and
+# embedding matrices, shared by training and tuning runs.
+DATASETS_DIR = os.path.join("data", "datasets")
@@ -1,11 +1,38 @@
+import hashlib
 import html
+import threading
+from collections import OrderedDict
 
-def render_highlighted(text: str, spans: list[dict]) -> str:
+CATEGORY_COLORS: dict[str, str] = {
+    "urgency": "#ffe08a",
+    "inevitability": "#ffb3b3",
+    "emotional_pressure": "#f8bbd0",
+    "authority_pressure": "#b3d4ff",
+    "dismissal_of_alternatives": "#d1c4e9",
+    "fear_based_pressure": "#ffcc80",
+    "reward_baiting": "#c8e6c9",
+}
+DEFAULT_COLOR = "#ffcc80"
+
+RENDER_CACHE_SIZE = 1024
+
+_RENDER_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_RENDER_LOCK = threading.Lock()
+
+
+def render_highlighted(text: str, spans: list[dict], colors: dict[str, str] | None = None) -> str:
     if not text:
         return ""
 
-    spans = [s for s in spans if 0 <= s["start"] < s["end"] <= len(text)]
-    spans = sorted(spans, key=lambda x: (x["start"], x["end"]))
+    colors = CATEGORY_COLORS if colors is None else colors
+    n = len(text)
+    spans = [s for s in spans if 0 <= s["start"] < s["end"] <= n]
+
+    # detector output is already ordered; only sort when it is not
+    for i in range(1, len(spans)):
+        if (spans[i]["start"], spans[i]["end"]) < (spans[i - 1]["start"], spans[i - 1]["end"]):
+            spans = sorted(spans, key=lambda x: (x["start"], x["end"]))
+            break
 
     out = []
     cursor = 0
@@ -13,20 +40,45 @@ def render_highlighted(text: str, spans: list[dict]) -> str:
         start, end = s["start"], s["end"]
         if start < cursor:
             continue
-        out.append(html.escape(text[cursor:start]))
+        if start > cursor:
+            out.append(html.escape(text[cursor:start]))
         frag = html.escape(text[start:end])
-
-        cat = s.get("category", "")
-        if cat == "urgency":
-            bg = "#ffe08a"
-        elif cat == "inevitability":
-            bg = "#ffb3b3"
-        else:
-            
-            bg = "#ffcc80"
-
+        bg = colors.get(s.get("category", ""), DEFAULT_COLOR)
         out.append(f"<span style='background-color:{bg}; padding:2px 4px; border-radius:4px;'>{frag}</span>")
         cursor = end
 
     out.append(html.escape(text[cursor:]))
-    return "".join(out)
\ No newline at end of file
+    return "".join(out)
+
+
+def _spans_signature(spans: list[dict]) -> tuple:
+    return tuple((s["start"], s["end"], s.get("category", "")) for s in spans)
+
+
+def render_highlighted_cached(text: str, spans: list[dict], colors: dict[str, str] | None = None) -> str:
+    """
+    Memoised render_highlighted. Past chat turns never change, so the HTML is
+    keyed by (content hash, spans signature, colour map) and reused across reruns.
+    """
+    if not text:
+        return ""
+
+    key = (
+        hashlib.sha1(text.encode("utf-8")).hexdigest(),
+        _spans_signature(spans),
+        None if colors is None else tuple(sorted(colors.items())),
+    )
+
+    with _RENDER_LOCK:
+        hit = _RENDER_CACHE.get(key)
+        if hit is not None:
+            _RENDER_CACHE.move_to_end(key)
+            return hit
+
+    out = render_highlighted(text, spans, colors)
+
+    with _RENDER_LOCK:
+        _RENDER_CACHE[key] = out
+        while len(_RENDER_CACHE) > RENDER_CACHE_SIZE:
+            _RENDER_CACHE.popitem(last=False)
+    return out